@@ -0,0 +1,106 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Request
+
+import logs
+import metrics
+
+
+class TokenBuckets:
+    """One token bucket per key, refilled at rate tokens/s up to burst
+
+    Idle buckets are dropped least-recently-used first once max_keys is hit;
+    a dropped bucket comes back full, which only ever errs on admitting.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def take(self, key: str) -> float:
+        """Spend a token; returns 0 on success, else seconds until one is available"""
+        now = time.monotonic()
+        bucket = self._buckets.pop(key, None) or [self.burst, now]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        self._buckets[key] = bucket
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / self.rate
+
+
+class AdmissionController:
+    """Per-email rate limits per route group plus a global in-flight cap"""
+
+    def __init__(self, groups: Dict[str, TokenBuckets], max_in_flight: int, queue_timeout: float):
+        self.groups = groups
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+    def limit(self, group: str):
+        """FastAPI dependency admitting a request of the given route group"""
+        buckets = self.groups[group]
+
+        async def admit(request: Request):
+            email = await _request_email(request)
+            if email:
+                logs.bind(email=email)
+                wait = buckets.take(email)
+                if wait:
+                    metrics.admission_shed_total.inc((group, "rate_limited"))
+                    raise HTTPException(
+                        status_code=429,
+                        detail="Muitas requisições, tente novamente em instantes",
+                        headers={"Retry-After": str(math.ceil(wait))}
+                    )
+
+            queued = time.perf_counter()
+            try:
+                if self._slots.locked():
+                    await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+                else:
+                    # Free slot: skip the task wait_for would create
+                    await self._slots.acquire()
+            except asyncio.TimeoutError:
+                metrics.admission_shed_total.inc((group, "overloaded"))
+                raise HTTPException(
+                    status_code=503,
+                    detail="Servidor sobrecarregado, tente novamente em instantes",
+                    headers={"Retry-After": "1"}
+                )
+            metrics.admission_queue_seconds.observe((group,), time.perf_counter() - queued)
+            metrics.admission_in_flight.inc()
+            try:
+                yield
+            finally:
+                metrics.admission_in_flight.dec()
+                self._slots.release()
+
+        return admit
+
+
+async def _request_email(request: Request) -> Optional[str]:
+    """The email a request acts for, from the path or the top level of the JSON body"""
+    if "email" in request.path_params:
+        return request.path_params["email"]
+    if request.method != "POST":
+        return None
+    # FastAPI has already parsed the body for the route and Request caches it
+    try:
+        body = await request.json()
+    except ValueError:
+        return None
+    email = body.get("email") if isinstance(body, dict) else None
+    return email if isinstance(email, str) else None
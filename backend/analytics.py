@@ -0,0 +1,125 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+DIAS = 7
+POINTS_QUANTILES = [0.25, 0.5, 0.75, 0.9, 0.99]
+POINTS_BINS = 10
+COHORT_PERIODS = {"day": "D", "week": "W", "month": "M"}
+
+USER_COLUMNS = ["email", "vicio_alvo", "created_at"]
+PROGRESS_COLUMNS = ["dias_completados", "pontos_totais", "tempo_limpo_inicio", "medalhas"]
+
+
+async def load_frame(db, batch_size: int = 5000) -> pd.DataFrame:
+    """One row per user with the progress columns the report needs"""
+    users = db.users.find({}, {"_id": 0, **{column: 1 for column in USER_COLUMNS}}, batch_size=batch_size)
+    progress = db.progress.find(
+        {},
+        {"_id": 0, "user_email": 1, **{column: 1 for column in PROGRESS_COLUMNS}},
+        batch_size=batch_size
+    )
+    users, progress = await asyncio.gather(users.to_list(None), progress.to_list(None))
+
+    users = pd.DataFrame.from_records(users, columns=USER_COLUMNS)
+    progress = pd.DataFrame.from_records(progress, columns=["user_email", *PROGRESS_COLUMNS])
+    frame = users.merge(progress, how="left", left_on="email", right_on="user_email")
+    return frame.drop(columns="user_email")
+
+
+def completion_matrix(dias_completados: pd.Series) -> np.ndarray:
+    """Users x days boolean matrix of completed days"""
+    dias = pd.to_numeric(dias_completados.reset_index(drop=True).explode(), errors="coerce")
+    dias = dias[dias.between(1, DIAS)]
+    matrix = np.zeros((len(dias_completados), DIAS), dtype=bool)
+    matrix[dias.index.to_numpy(), dias.to_numpy(dtype=int) - 1] = True
+    return matrix
+
+
+def funnel(matrix: np.ndarray) -> List[Dict[str, Any]]:
+    """Per day, users who completed it and users who completed every day up to it"""
+    users = max(len(matrix), 1)
+    completed = matrix.sum(axis=0)
+    reached = np.logical_and.accumulate(matrix, axis=1).sum(axis=0)
+    return [
+        {
+            "dia": dia + 1,
+            "completed": int(completed[dia]),
+            "reached": int(reached[dia]),
+            "rate": float(reached[dia] / users),
+        }
+        for dia in range(DIAS)
+    ]
+
+
+def retention(matrix: np.ndarray, created_at: pd.Series, cohort: str) -> List[Dict[str, Any]]:
+    """Share of each signup cohort that completed each day"""
+    periods = pd.to_datetime(created_at.reset_index(drop=True)).dt.to_period(COHORT_PERIODS[cohort])
+    grouped = pd.DataFrame(matrix, columns=range(1, DIAS + 1)).groupby(periods.dt.start_time)
+    sizes = grouped.size()
+    rates = grouped.mean()
+    return [
+        {
+            "cohort": start.date().isoformat(),
+            "users": int(sizes[start]),
+            "retention": [float(rate) for rate in rates.loc[start]],
+        }
+        for start in sizes.index
+    ]
+
+
+def points_distribution(frame: pd.DataFrame) -> Dict[str, Any]:
+    """Quantiles and histogram of pontos_totais, overall and per vicio_alvo"""
+    points = frame["pontos_totais"].fillna(0).to_numpy(dtype=float)
+    if not len(points):
+        return {"quantiles": {}, "histogram": [], "by_vicio_alvo": {}}
+
+    counts, edges = np.histogram(points, bins=POINTS_BINS)
+    by_vicio_alvo = (
+        frame.assign(pontos_totais=points)
+        .groupby("vicio_alvo")["pontos_totais"]
+        .agg(["count", "mean", "median", "sum"])
+    )
+    return {
+        "mean": float(points.mean()),
+        "quantiles": {f"p{round(q * 100)}": float(v) for q, v in zip(POINTS_QUANTILES, np.quantile(points, POINTS_QUANTILES))},
+        "histogram": [
+            {"min": float(low), "max": float(high), "users": int(count)}
+            for low, high, count in zip(edges[:-1], edges[1:], counts)
+        ],
+        "by_vicio_alvo": {
+            vicio_alvo: {"users": int(row["count"]), "mean": float(row["mean"]), "median": float(row["median"]), "total": int(row["sum"])}
+            for vicio_alvo, row in by_vicio_alvo.iterrows()
+        },
+    }
+
+
+def summarize(frame: pd.DataFrame, cohort: str = "week", now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Funnel, retention and points report for the users in frame"""
+    now = now or datetime.utcnow()
+    matrix = completion_matrix(frame["dias_completados"])
+
+    clean_days = (now - pd.to_datetime(frame["tempo_limpo_inicio"])).dt.total_seconds().dropna() / 86400
+    medals = frame["medalhas"].explode().dropna().value_counts()
+    return {
+        "generated_at": now,
+        "users": len(frame),
+        "onboarded": int(frame["vicio_alvo"].notna().sum()),
+        "funnel": funnel(matrix),
+        "retention": retention(matrix, frame["created_at"], cohort),
+        "points": points_distribution(frame),
+        "tempo_limpo_dias": {
+            "median": float(clean_days.median()) if len(clean_days) else 0.0,
+            "mean": float(clean_days.mean()) if len(clean_days) else 0.0,
+        },
+        "medalhas": {medal: int(count) for medal, count in medals.items()},
+    }
+
+
+async def cohort_report(db, cohort: str = "week") -> Dict[str, Any]:
+    """Load the progress columns and summarize them off the event loop"""
+    frame = await load_frame(db)
+    return await asyncio.to_thread(summarize, frame, cohort)
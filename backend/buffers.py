@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError
+
+
+def unapplied(writes: List[Any], error: BaseException) -> Optional[List[Any]]:
+    """The writes of a failed unordered bulk write that the server did not apply
+
+    None when that isn't known, e.g. the connection dropped mid-write.
+    """
+    if isinstance(error, BulkWriteError):
+        failed = {write_error["index"] for write_error in error.details["writeErrors"]}
+        return [write for index, write in enumerate(writes) if index in failed]
+    if isinstance(error, ServerSelectionTimeoutError):
+        return writes  # Never sent
+    return None
+
+
+class FlushBuffer(ABC):
+    """Holds writes in memory and flushes them every flush_interval seconds,
+    or early once max_batch are pending
+
+    Subclasses keep their pending writes in _pending and define how they are
+    taken, batched, written and put back. Flushes run one at a time. When a
+    batch fails, or its write is cancelled, what _unwritten picks out of it
+    goes back to the buffer with every later batch and is retried on the
+    next flush. Anything still buffered is lost if the process dies.
+    """
+
+    def __init__(self, db, flush_interval: float, max_batch: int):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._early = None
+        self.flushed = 0
+
+    @abstractmethod
+    def _take(self) -> List[Any]:
+        """Remove and return the pending writes, oldest first"""
+
+    @abstractmethod
+    def _restore(self, items: List[Any]) -> None:
+        """Put back writes that were taken but not written"""
+
+    def _batches(self, items: List[Any]) -> List[List[Any]]:
+        return [items[start:start + self.max_batch] for start in range(0, len(items), self.max_batch)]
+
+    @abstractmethod
+    async def _write(self, batch: List[Any]) -> None:
+        """Write one batch, raising if any of it failed"""
+
+    @abstractmethod
+    def _unwritten(self, batch: List[Any], error: BaseException) -> List[Any]:
+        """The part of a batch whose write raised error to retry"""
+
+    def _added(self) -> None:
+        """Start an early flush once max_batch writes are pending"""
+        if len(self._pending) >= self.max_batch and self._early is None:
+            self._early = asyncio.ensure_future(self._flush_early())
+
+    async def _flush_early(self) -> None:
+        try:
+            await self.flush()
+        finally:
+            self._early = None
+
+    async def flush(self) -> None:
+        """Write everything pending, one batch at a time"""
+        async with self._lock:
+            batches = self._batches(self._take())
+            for i, batch in enumerate(batches):
+                try:
+                    await self._write(batch)
+                except BaseException as e:
+                    self._restore(self._unwritten(batch, e) + [item for rest in batches[i + 1:] for item in rest])
+                    if isinstance(e, asyncio.CancelledError):
+                        raise
+                    logging.error("%s flush error: %s", type(self).__name__, e, exc_info=e)
+                    return
+                self.flushed += len(batch)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            # Shielded so that close() stops the loop without interrupting a write
+            await asyncio.shield(self.flush())
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop the periodic flush and drain what is still pending
+
+        A flush already running is waited for, not cancelled.
+        """
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._early:
+            await self._early
+        await self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "flushed": self.flushed,
+        }
@@ -0,0 +1,177 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+
+class DocumentCache:
+    """Bounded LRU cache with a per-entry TTL"""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 30.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Bumped on every invalidation; a read notes it before querying so
+        # set can tell whether its key was invalidated meanwhile
+        self.generation = 0
+        self._invalidated: "OrderedDict[Hashable, int]" = OrderedDict()
+        # Generation of the oldest invalidation no longer in _invalidated
+        self._floor = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        """Store value; skipped if generation is given and key was invalidated since"""
+        if generation is not None and self._invalidated.get(key, self._floor) > generation:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        self.generation += 1
+        self._invalidated[key] = self.generation
+        self._invalidated.move_to_end(key)
+        if len(self._invalidated) > self.max_size:
+            _, self._floor = self._invalidated.popitem(last=False)
+        if self._entries.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._floor = self.generation
+        self._invalidated.clear()
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class SingleFlight:
+    """Runs one call per key at a time and shares its result with concurrent callers
+
+    The call runs in its own task, so a caller that gives up (e.g. a client
+    disconnect) doesn't cancel it for the others.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args))
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self.forget(key, task))
+            self.calls += 1
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def forget(self, key: Hashable, task: Optional[asyncio.Future] = None) -> None:
+        """Make later callers start a new call instead of joining the current one"""
+        if task is None or self._calls.get(key) is task:
+            self._calls.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._calls),
+            "calls": self.calls,
+            "shared": self.shared,
+        }
+
+
+class BatchLoader:
+    """Collects loads for different keys and fetches them in one call
+
+    Keys requested within window seconds of the first one (0 means the same
+    event-loop iteration), up to max_batch, are passed together to fetch,
+    which returns a dict of the values it found. Every caller gets the value
+    for its own key, or None. A failed fetch fails every caller in the batch.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+        window: float = 0.001,
+        max_batch: int = 100
+    ):
+        self.fetch = fetch
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[Hashable, List[asyncio.Future]] = {}
+        self._timer = None
+        self.loads = 0
+        self.batches = 0
+
+    def load(self, key: Hashable) -> Awaitable[Any]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(key, []).append(future)
+        self.loads += 1
+        if len(self._pending) >= self.max_batch:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._dispatch) if self.window > 0 else loop.call_soon(self._dispatch)
+        return future
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, {}
+        if pending:
+            self.batches += 1
+            asyncio.ensure_future(self._run(pending))
+
+    async def _run(self, pending: Dict[Hashable, List[asyncio.Future]]) -> None:
+        try:
+            found = await self.fetch(list(pending))
+        except Exception as e:
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for key, futures in pending.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(found.get(key))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "loads": self.loads,
+            "batches": self.batches,
+        }
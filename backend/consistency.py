@@ -0,0 +1,50 @@
+import time
+from contextvars import ContextVar
+
+# Server time of the current client's last write, from its X-Last-Write header
+_last_write: ContextVar[float] = ContextVar("last_write", default=0.0)
+
+_READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def last_write() -> float:
+    """When the client making this request last wrote, or 0 if not known"""
+    return _last_write.get()
+
+
+class WriteMarkerMiddleware:
+    """ASGI middleware carrying a client's last write time across workers
+
+    Successful writes are answered with an X-Last-Write header holding the
+    server time. Clients send it back on later requests, so whichever worker
+    serves them knows the client wrote recently. A forged value can only send
+    that client's own reads to the primary.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        marker = 0.0
+        for name, value in scope["headers"]:
+            if name == b"x-last-write":
+                try:
+                    marker = float(value)
+                except ValueError:
+                    pass
+
+        async def send_marker(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                headers = list(message.get("headers", [])) + [(b"x-last-write", f"{time.time():.3f}".encode())]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _last_write.set(marker)
+        try:
+            await self.app(scope, receive, send if scope["method"] in _READ_METHODS else send_marker)
+        finally:
+            _last_write.reset(token)
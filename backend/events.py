@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+from buffers import FlushBuffer, unapplied
+
+
+class EventLog(FlushBuffer):
+    """Appends events to a time-series collection in batches, off the request path
+
+    emit() never waits on Mongo. Each flush inserts the buffered events and
+    adds them to per-hour, per-type counters in a second collection, which
+    is what activity timelines read. Past max_pending, new events are
+    dropped and counted.
+
+    The two writes are retried separately: events are counted into their
+    hours once inserted, so a failed counter update never inserts them
+    again. Time-series collections don't enforce unique _id, so events and
+    counters whose write has an unknown outcome are dropped, not retried.
+    """
+
+    def __init__(
+        self,
+        db,
+        collection: str = "events",
+        hourly_collection: str = "event_hours",
+        flush_interval: float = 1.0,
+        max_batch: int = 1000,
+        max_pending: int = 100000,
+        timeseries: bool = True
+    ):
+        super().__init__(db, flush_interval, max_batch)
+        self.collection = collection
+        self.hourly_collection = hourly_collection
+        self.max_pending = max_pending
+        self.timeseries = timeseries
+        self._pending: List[Dict[str, Any]] = []
+        # Counters of inserted events, by (hour, type), still to be added
+        self._hours: Dict[Tuple[datetime, str], Dict[str, int]] = {}
+        self.emitted = 0
+        self.dropped = 0
+
+    async def create_collection(self) -> None:
+        """Create the time-series collection; needs MongoDB 5.0+"""
+        if not self.timeseries:
+            return  # A regular collection is created on first insert
+        try:
+            await self.db.create_collection(
+                self.collection,
+                timeseries={"timeField": "ts", "metaField": "meta", "granularity": "minutes"}
+            )
+        except CollectionInvalid:
+            pass  # Already exists
+        except OperationFailure as e:
+            logging.error("Event log collection error: %s", e, exc_info=e)
+
+    def emit(
+        self,
+        user: str,
+        type: str,
+        dia: Optional[int] = None,
+        pontos: Optional[int] = None,
+        ts: Optional[datetime] = None
+    ) -> None:
+        """Buffer an event"""
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return
+
+        event = {"ts": ts or datetime.utcnow(), "meta": {"user": user, "type": type}}
+        if dia is not None:
+            event["dia"] = dia
+        if pontos is not None:
+            event["pontos"] = pontos
+        self._pending.append(event)
+        self.emitted += 1
+        self._added()
+
+    def _take(self) -> List[Dict[str, Any]]:
+        pending, self._pending = self._pending, []
+        return pending
+
+    def _restore(self, events: List[Dict[str, Any]]) -> None:
+        self._pending[:0] = events
+        if len(self._pending) > self.max_pending:
+            self.dropped += len(self._pending) - self.max_pending
+            del self._pending[self.max_pending:]
+
+    def _count(self, events: List[Dict[str, Any]]) -> None:
+        for event in events:
+            hour = event["ts"].replace(minute=0, second=0, microsecond=0)
+            self._add_hour((hour, event["meta"]["type"]), {"count": 1, "pontos": event.get("pontos", 0)})
+
+    def _add_hour(self, key: Tuple[datetime, str], counters: Dict[str, int]) -> None:
+        pending = self._hours.setdefault(key, {"count": 0, "pontos": 0})
+        for field, value in counters.items():
+            pending[field] += value
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> None:
+        await self.db[self.collection].insert_many(batch, ordered=False)
+        self._count(batch)
+
+    def _unwritten(self, batch: List[Dict[str, Any]], error: BaseException) -> List[Dict[str, Any]]:
+        retry = unapplied(batch, error)
+        if retry is None:
+            self.dropped += len(batch)
+            logging.error("Event log dropped %s events of unknown outcome", len(batch))
+            return []
+        retried = {id(event) for event in retry}
+        self._count([event for event in batch if id(event) not in retried])
+        return retry
+
+    async def flush(self) -> None:
+        """Insert pending events, then add inserted ones to their hourly counters"""
+        await super().flush()
+        async with self._lock:
+            if self._hours:
+                await self._flush_hours()
+
+    async def _flush_hours(self) -> None:
+        hours = list(self._hours.items())
+        self._hours = {}
+        try:
+            await self.db[self.hourly_collection].bulk_write([
+                UpdateOne({"hour": hour, "type": type}, {"$inc": counters}, upsert=True)
+                for (hour, type), counters in hours
+            ], ordered=False)
+        except BaseException as e:
+            retry = unapplied(hours, e)
+            if retry is None:
+                logging.error("Event log dropped %s hourly counters of unknown outcome", len(hours))
+            for key, counters in retry or []:
+                self._add_hour(key, counters)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            logging.error("EventLog hourly flush error: %s", e, exc_info=e)
+
+    def stats(self) -> Dict[str, int]:
+        return {**super().stats(), "emitted": self.emitted, "dropped": self.dropped, "pending_hours": len(self._hours)}
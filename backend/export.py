@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Streaming export of users joined with their progress, as NDJSON or CSV
+
+Users are read in _id order one cursor batch at a time, and each batch is
+joined with one progress query, so memory stays flat however many users
+there are. Rows are keyed by the user _id: passing the last exported _id as
+after resumes an interrupted export.
+
+    python export.py --format csv --output users.csv
+    python export.py --vicio-alvo "redes sociais" --created-after 2026-01-01
+    python export.py --after 65f0c0ffee0123456789abcd >> users.ndjson
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import orjson
+from bson import ObjectId
+from bson.errors import InvalidId
+
+COLUMNS = [
+    "_id",
+    "email",
+    "vicio_alvo",
+    "created_at",
+    "last_active",
+    "dia_atual",
+    "dias_completados",
+    "pontos_totais",
+    "tempo_limpo_inicio",
+    "medalhas",
+    "updated_at",
+]
+USER_FIELDS = ["email", "vicio_alvo", "created_at", "last_active"]
+PROGRESS_FIELDS = ["dia_atual", "dias_completados", "pontos_totais", "tempo_limpo_inicio", "medalhas", "updated_at"]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _naive_utc(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+def export_query(
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    vicio_alvo: Optional[str] = None,
+    after: Optional[str] = None
+) -> Dict[str, Any]:
+    """users filter for an export; raises ValueError on a malformed after"""
+    query: Dict[str, Any] = {}
+    if after:
+        try:
+            query["_id"] = {"$gt": ObjectId(after)}
+        except InvalidId:
+            raise ValueError(f"Invalid after cursor: {after}")
+    if created_after or created_before:
+        query["created_at"] = {}
+        if created_after:
+            query["created_at"]["$gte"] = _naive_utc(created_after)
+        if created_before:
+            query["created_at"]["$lt"] = _naive_utc(created_before)
+    if vicio_alvo:
+        query["vicio_alvo"] = vicio_alvo
+    return query
+
+
+async def _join(db, users: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Export rows for a batch of users, with one progress query for the batch"""
+    cursor = db.progress.find(
+        {"user_email": {"$in": [user["email"] for user in users]}},
+        {"_id": 0, "user_email": 1, **{field: 1 for field in PROGRESS_FIELDS}}
+    )
+    progress = {doc["user_email"]: doc async for doc in cursor}
+
+    rows = []
+    for user in users:
+        doc = progress.get(user["email"], {})
+        rows.append({
+            "_id": str(user["_id"]),
+            **{field: user.get(field) for field in USER_FIELDS},
+            **{field: doc.get(field) for field in PROGRESS_FIELDS},
+        })
+    return rows
+
+
+async def export_batches(
+    db,
+    query: Dict[str, Any],
+    batch_size: int = 500,
+    limit: Optional[int] = None
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Joined rows in _id order, one list per users cursor batch"""
+    cursor = db.users.find(
+        query,
+        {field: 1 for field in USER_FIELDS},
+        sort=[("_id", 1)],
+        batch_size=batch_size,
+        limit=limit or 0
+    )
+    users = []
+    async for user in cursor:
+        users.append(user)
+        if len(users) >= batch_size:
+            yield await _join(db, users)
+            users = []
+    if users:
+        yield await _join(db, users)
+
+
+def encode_ndjson(rows: List[Dict[str, Any]]) -> bytes:
+    return b"".join(orjson.dumps(row) + b"\n" for row in rows)
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return ";".join(str(item) for item in value)
+    return value
+
+
+def encode_csv(rows: List[Dict[str, Any]], header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(COLUMNS)
+    writer.writerows([_csv_value(row[column]) for column in COLUMNS] for row in rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+async def export_stream(
+    db,
+    query: Dict[str, Any],
+    format: str = "ndjson",
+    batch_size: int = 500,
+    limit: Optional[int] = None,
+    header: bool = True
+) -> AsyncIterator[bytes]:
+    """The export encoded as format, one chunk per batch
+
+    A resumed CSV export should pass header=False, so that its output can be
+    appended to the previous one.
+    """
+    if format == "csv" and header:
+        yield encode_csv([], header=True)
+    async for rows in export_batches(db, query, batch_size, limit):
+        yield encode_csv(rows) if format == "csv" else encode_ndjson(rows)
+
+
+# ==================== CLI ====================
+
+async def run(args) -> Optional[str]:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    db = client[os.environ["DB_NAME"]]
+    query = export_query(args.created_after, args.created_before, args.vicio_alvo, args.after)
+
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    last_id = None
+    try:
+        if args.format == "csv" and not args.after:
+            output.write(encode_csv([], header=True))
+        async for rows in export_batches(db, query, args.batch_size, args.limit):
+            output.write(encode_csv(rows) if args.format == "csv" else encode_ndjson(rows))
+            last_id = rows[-1]["_id"]
+    finally:
+        if args.output:
+            output.close()
+        client.close()
+    return last_id
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv(Path(__file__).parent / ".env")
+
+    parser = argparse.ArgumentParser(description="Export users joined with progress")
+    parser.add_argument("--format", choices=sorted(MEDIA_TYPES), default="ndjson")
+    parser.add_argument("--output", type=Path, help="file to write (default: stdout)")
+    parser.add_argument("--created-after", type=datetime.fromisoformat)
+    parser.add_argument("--created-before", type=datetime.fromisoformat)
+    parser.add_argument("--vicio-alvo")
+    parser.add_argument("--after", help="resume after this user _id")
+    parser.add_argument("--limit", type=int, help="stop after this many users")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    try:
+        last_id = asyncio.run(run(args))
+    except ValueError as e:
+        raise SystemExit(str(e))
+    if last_id:
+        print(f"Last exported _id: {last_id} (resume with --after {last_id})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
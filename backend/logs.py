@@ -0,0 +1,178 @@
+import contextvars
+import hashlib
+import logging
+import queue
+import re
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+
+# Per-request fields added to every record logged while serving the request
+_request: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("request", default=None)
+
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+
+
+def email_hash(email: str) -> str:
+    """Stable pseudonym for an email, so logs can be correlated without storing it"""
+    return hashlib.sha256(email.lower().encode()).hexdigest()[:16]
+
+
+def redact(text: str) -> str:
+    """Replace the emails in text with their email_hash"""
+    return _EMAIL.sub(lambda match: f"<email:{email_hash(match.group())}>", text)
+
+
+def bind(**fields: Any) -> None:
+    """Add fields to the current request's log context"""
+    context = _request.get()
+    if context is not None:
+        context.update(fields)
+
+
+class RequestContextMiddleware:
+    """ASGI middleware giving each request a log context with its route and start time"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = _request.set({"scope": scope, "start": time.perf_counter()})
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request.reset(token)
+
+
+class SamplingFilter(logging.Filter):
+    """Lets through at most burst identical records per window seconds
+
+    Records are identical when logger, level, message template and
+    exception class match, so call sites should pass values as arguments
+    ("Login error: %s", e) rather than format them in. The first record let
+    through after a suppressed run carries the count as suppressed.
+    """
+
+    def __init__(self, burst: int = 10, window: float = 60.0, max_keys: int = 10000):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.max_keys = max_keys
+        # key -> [window start, records let through, records suppressed]
+        self._seen: "OrderedDict[Tuple, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            return True
+
+        error = record.exc_info[0].__name__ if record.exc_info else None
+        key = (record.name, record.levelno, str(record.msg), error)
+        now = time.monotonic()
+        with self._lock:
+            seen = self._seen.pop(key, None)
+            if seen is None or now - seen[0] >= self.window:
+                seen = [now, 0, seen[2] if seen else 0]
+            self._seen[key] = seen
+            if len(self._seen) > self.max_keys:
+                self._seen.popitem(last=False)
+
+            if seen[1] >= self.burst:
+                seen[2] += 1
+                self.suppressed += 1
+                return False
+            seen[1] += 1
+            if seen[2]:
+                record.suppressed = seen[2]
+                seen[2] = 0
+        return True
+
+
+class ContextQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: it attaches the request context and
+    leaves formatting to the listener thread, dropping records when the
+    queue is full
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        context = _request.get()
+        if context is not None:
+            route = context["scope"].get("route")
+            record.route = getattr(route, "path", None) or context["scope"].get("path")
+            record.latency_ms = round((time.perf_counter() - context["start"]) * 1000, 2)
+            if context.get("email"):
+                record.email_hash = email_hash(context["email"])
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, with emails replaced by their email_hash"""
+
+    FIELDS = ("route", "email_hash", "latency_ms", "suppressed")
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": redact(record.getMessage()),
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = redact(value) if isinstance(value, str) else value
+        if record.exc_info:
+            entry["error"] = record.exc_info[0].__name__
+            entry["traceback"] = redact("".join(traceback.format_exception(*record.exc_info)))
+        return orjson.dumps(entry, default=str).decode()
+
+
+def setup_logging(
+    level: int = logging.INFO,
+    sample_burst: int = 10,
+    sample_window: float = 60.0,
+    max_queue: int = 10000,
+    stream=None
+) -> QueueListener:
+    """Route the root logger through a queue to a JSON stream handler on its own thread
+
+    Returns the started listener; stop() it on shutdown to drain the queue.
+    """
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JSONFormatter())
+
+    queue_handler = ContextQueueHandler(queue.Queue(max_queue))
+    queue_handler.addFilter(SamplingFilter(sample_burst, sample_window))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = QueueListener(queue_handler.queue, handler, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,269 @@
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+from pymongo import monitoring
+
+# Cold-start timings are measured from when the process first imported this
+PROCESS_START = time.perf_counter()
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250)
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter, one series per label tuple"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: Tuple[str, ...] = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.labels, labels)} {value}"
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+
+    kind = "gauge"
+
+    def dec(self, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+    def set(self, labels: Tuple[str, ...] = (), value: float = 0) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram:
+    """Cumulative histogram in Prometheus' bucket/sum/count layout"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        with self._lock:
+            # One slot per bucket, then +Inf, sum
+            series = self._series.setdefault(labels, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def samples(self) -> Iterable[str]:
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = _labels(self.labels, labels, f'le="{bound}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            cumulative += series[len(self.buckets)]
+            le = _labels(self.labels, labels, 'le="+Inf"')
+            yield f"{self.name}_bucket{le} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {series[-1]}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {cumulative}"
+
+
+def render(metrics) -> str:
+    """Prometheus text exposition format for the given metrics"""
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+http_requests_in_flight = Gauge("http_requests_in_flight", "Requests currently being served")
+http_requests_total = Counter(
+    "http_requests_total", "Requests served, by route and status", ("method", "route", "status")
+)
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds", "Request latency, by route", ("method", "route")
+)
+mongo_command_duration_seconds = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency", ("collection", "command")
+)
+mongo_command_failures_total = Counter(
+    "mongo_command_failures_total", "Failed MongoDB commands", ("collection", "command")
+)
+admission_in_flight = Gauge("admission_in_flight", "Admitted requests holding a slot")
+admission_queue_seconds = Histogram(
+    "admission_queue_seconds", "Time spent waiting for a slot, by route group", ("group",)
+)
+admission_shed_total = Counter(
+    "admission_shed_total", "Requests rejected by admission control", ("group", "reason")
+)
+mongo_pool_connections = Gauge(
+    "mongo_pool_connections", "Open MongoDB pool connections, by server", ("address",)
+)
+mongo_pool_checked_out = Gauge(
+    "mongo_pool_checked_out", "MongoDB pool connections in use, by server", ("address",)
+)
+mongo_batch_size = Histogram(
+    "mongo_batch_size", "Keys fetched per batched lookup", ("collection",), buckets=BATCH_BUCKETS
+)
+mongo_round_trips_saved_total = Counter(
+    "mongo_round_trips_saved_total", "Queries avoided by batching lookups", ("collection",)
+)
+payload_rejected_total = Counter(
+    "payload_rejected_total", "Request bodies rejected by payload limits, by route and limit", ("route", "reason")
+)
+cold_start_seconds = Gauge(
+    "cold_start_seconds", "Seconds from process start to ready and to the first successful request", ("phase",)
+)
+
+REGISTRY = [
+    http_requests_in_flight,
+    http_requests_total,
+    http_request_duration_seconds,
+    mongo_command_duration_seconds,
+    mongo_command_failures_total,
+    admission_in_flight,
+    admission_queue_seconds,
+    admission_shed_total,
+    mongo_pool_connections,
+    mongo_pool_checked_out,
+    mongo_batch_size,
+    mongo_round_trips_saved_total,
+    payload_rejected_total,
+    cold_start_seconds,
+]
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and in-flight requests per route"""
+
+    def __init__(self, app):
+        self.app = app
+        self.first_success = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            if status < 400 and self.first_success is None:
+                self.first_success = time.perf_counter()
+                cold_start_seconds.set(("first_request",), self.first_success - PROCESS_START)
+            # Route templates keep the label set bounded (no emails in labels)
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            http_request_duration_seconds.observe((scope["method"], path), time.perf_counter() - start)
+            http_requests_total.inc((scope["method"], path, str(status)))
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Times every MongoDB command by collection and command name"""
+
+    def __init__(self):
+        self._collections: Dict[int, str] = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        self._collections[event.request_id] = collection if isinstance(collection, str) else ""
+
+    def succeeded(self, event):
+        collection = self._collections.pop(event.request_id, "")
+        mongo_command_duration_seconds.observe((collection, event.command_name), event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._collections.pop(event.request_id, "")
+        mongo_command_duration_seconds.observe((collection, event.command_name), event.duration_micros / 1e6)
+        mongo_command_failures_total.inc((collection, event.command_name))
+
+
+class MongoPoolMonitor(monitoring.ConnectionPoolListener):
+    """Tracks open and checked-out pool connections per server"""
+
+    def __init__(self):
+        self.connections: Dict[str, int] = {}
+        self.checked_out: Dict[str, int] = {}
+
+    def _add(self, counts: Dict[str, int], gauge: Gauge, address, amount: int):
+        key = f"{address[0]}:{address[1]}"
+        counts[key] = counts.get(key, 0) + amount
+        gauge.set((key,), counts[key])
+
+    def connection_created(self, event):
+        self._add(self.connections, mongo_pool_connections, event.address, 1)
+
+    def connection_closed(self, event):
+        self._add(self.connections, mongo_pool_connections, event.address, -1)
+
+    def connection_checked_out(self, event):
+        self._add(self.checked_out, mongo_pool_checked_out, event.address, 1)
+
+    def connection_checked_in(self, event):
+        self._add(self.checked_out, mongo_pool_checked_out, event.address, -1)
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pass
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            address: {"connections": count, "checked_out": self.checked_out.get(address, 0)}
+            for address, count in sorted(self.connections.items())
+        }
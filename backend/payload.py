@@ -0,0 +1,226 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+from starlette.responses import JSONResponse
+
+import metrics
+
+_STRUCTURE = re.compile(rb'[{}\[\],:"]')
+_STRING = re.compile(rb'["\\]')
+
+# Keys longer than this can't match a configured field, so aren't kept. Raw
+# keys are kept longer since each character may be written as a \uXXXX escape
+_MAX_KEY = 64
+_MAX_RAW_KEY = 6 * _MAX_KEY
+
+
+def _decode_key(raw: bytes) -> str:
+    """A key as written between its quotes, with JSON escapes decoded"""
+    if b"\\" in raw:
+        try:
+            return orjson.loads(b'"' + raw + b'"')
+        except orjson.JSONDecodeError:
+            pass
+    return raw.decode("utf-8", "replace")
+
+
+class FieldLimits:
+    """Bounds on one JSON field: serialized bytes, nesting depth and object keys"""
+
+    def __init__(self, max_bytes: int, max_depth: int, max_keys: int):
+        self.max_bytes = max_bytes
+        self.max_depth = max_depth
+        self.max_keys = max_keys
+
+
+class PayloadRejected(Exception):
+    def __init__(self, status_code: int, reason: str, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.reason = reason
+        self.detail = detail
+
+
+class JSONScanner:
+    """Checks FieldLimits on a JSON document fed in chunks, without parsing it
+
+    Fields are dotted paths from the root, with * for any array item, e.g.
+    "operations.*.data". feed() raises PayloadRejected as soon as a field
+    goes over one of its limits. Malformed JSON is left for the parser to
+    reject.
+    """
+
+    def __init__(self, fields: Dict[str, FieldLimits]):
+        self.fields = {tuple(path.split(".")): limits for path, limits in fields.items()}
+        self.position = 0
+        # Offset just past the character being handled
+        self._at = 0
+        # One [is_object, key] frame per open container; arrays use "*"
+        self._stack: List[list] = []
+        self._expect_key = False
+        self._in_string = False
+        self._escape = False
+        self._key: Optional[bytearray] = None
+        # [path, limits, start, base depth, keys] of the field being measured
+        self._field: Optional[list] = None
+
+    def feed(self, chunk: bytes) -> None:
+        i = 0
+        end = len(chunk)
+        while i < end:
+            if self._in_string:
+                i = self._scan_string(chunk, i)
+                continue
+
+            match = _STRUCTURE.search(chunk, i)
+            if match is None:
+                break
+            i = match.end()
+            self._at = self.position + i
+            char = match.group()
+            if char == b'"':
+                self._open_string()
+            elif char in b"{[":
+                self._open_container(char == b"{")
+            elif char in b"}]":
+                self._close_container()
+            elif char == b":":
+                self._expect_key = False
+            elif self._stack and self._stack[-1][0]:  # , in an object
+                self._expect_key = True
+
+        self.position += end
+        self._check_bytes(self.position)
+
+    def _start_field(self) -> None:
+        if self._field is None:
+            path = tuple(frame[1] for frame in self._stack)
+            limits = self.fields.get(path)
+            if limits:
+                self._field = [".".join(path), limits, self._at - 1, len(self._stack), 0]
+
+    def _open_string(self) -> None:
+        self._in_string = True
+        if self._stack and self._stack[-1][0] and self._expect_key:
+            self._key = bytearray()
+        else:
+            self._start_field()
+
+    def _scan_string(self, chunk: bytes, i: int) -> int:
+        if self._escape:
+            self._escape = False
+            if self._key is not None and len(self._key) < _MAX_RAW_KEY:
+                self._key += b"\\" + chunk[i:i + 1]
+            return i + 1
+
+        match = _STRING.search(chunk, i)
+        stop = match.start() if match else len(chunk)
+        if self._key is not None and len(self._key) < _MAX_RAW_KEY:
+            self._key += chunk[i:stop][:_MAX_RAW_KEY - len(self._key)]
+        if match is None:
+            return len(chunk)
+
+        if match.group() == b"\\":
+            self._escape = True
+            return match.end()
+
+        self._in_string = False
+        self._at = self.position + match.end()
+        if self._key is not None:
+            self._stack[-1][1] = _decode_key(bytes(self._key))
+            self._key = None
+            if self._field is not None:
+                self._field[4] += 1
+                if self._field[4] > self._field[1].max_keys:
+                    raise PayloadRejected(422, "keys", f"Campo {self._field[0]} tem mais de {self._field[1].max_keys} chaves")
+        elif self._field is not None and self._field[3] == len(self._stack):
+            self._end_field()
+        return match.end()
+
+    def _open_container(self, is_object: bool) -> None:
+        self._start_field()
+        self._stack.append([is_object, "*"])
+        self._expect_key = is_object
+        if self._field is not None and len(self._stack) - self._field[3] > self._field[1].max_depth:
+            raise PayloadRejected(422, "depth", f"Campo {self._field[0]} tem mais de {self._field[1].max_depth} níveis")
+
+    def _close_container(self) -> None:
+        if not self._stack:
+            return
+        self._stack.pop()
+        self._expect_key = False
+        if self._field is not None and self._field[3] == len(self._stack):
+            self._end_field()
+
+    def _end_field(self) -> None:
+        self._check_bytes(self._at)
+        self._field = None
+
+    def _check_bytes(self, position: int) -> None:
+        if self._field is not None and position - self._field[2] > self._field[1].max_bytes:
+            raise PayloadRejected(413, "bytes", f"Campo {self._field[0]} excede {self._field[1].max_bytes} bytes")
+
+
+class RouteLimits:
+    """Body size cap for a route plus FieldLimits for fields of its JSON body"""
+
+    def __init__(self, max_bytes: int, fields: Optional[Dict[str, FieldLimits]] = None):
+        self.max_bytes = max_bytes
+        self.fields = fields or {}
+
+
+class PayloadLimitMiddleware:
+    """ASGI middleware checking request bodies against RouteLimits as they arrive
+
+    The body of a limited route is read here, chunk by chunk, and scanned
+    before the app sees any of it. A body over a limit is answered with
+    413/422 without reading the rest; otherwise the buffered chunks are
+    replayed to the app.
+    """
+
+    def __init__(self, app, routes: Dict[Tuple[str, str], RouteLimits]):
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        limits = self.routes.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+        if limits is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            messages = await self._read(scope, receive, limits)
+        except PayloadRejected as e:
+            metrics.payload_rejected_total.inc((scope["path"], e.reason))
+            response = JSONResponse({"detail": e.detail}, status_code=e.status_code, headers={"Connection": "close"})
+            await response(scope, receive, send)
+            return
+
+        async def replay():
+            if messages:
+                return messages.pop(0)
+            return await receive()
+
+        await self.app(scope, replay, send)
+
+    async def _read(self, scope, receive, limits: RouteLimits) -> List[dict]:
+        too_large = PayloadRejected(413, "body", f"Requisição excede {limits.max_bytes} bytes")
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > limits.max_bytes:
+                raise too_large
+
+        scanner = JSONScanner(limits.fields)
+        messages = []
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                return messages
+
+            body = message.get("body", b"")
+            if scanner.position + len(body) > limits.max_bytes:
+                raise too_large
+            scanner.feed(body)
+            if not message.get("more_body"):
+                return messages
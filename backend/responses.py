@@ -0,0 +1,103 @@
+import functools
+import gzip
+from typing import Any, Callable, Dict, Mapping, Optional
+
+import orjson
+from bson import ObjectId
+from fastapi.routing import APIRoute
+from starlette.responses import JSONResponse, Response
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class BSONResponse(JSONResponse):
+    """JSON response rendered with orjson, aware of ObjectId and datetime"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _accepted(accept_encoding: str) -> Dict[str, float]:
+    """Content codings from an Accept-Encoding header, by quality"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    return accepted
+
+
+def compressed(
+    content: Any,
+    accept_encoding: Optional[str],
+    headers: Optional[Mapping[str, str]] = None,
+    minimum_size: int = 1024
+) -> Response:
+    """BSONResponse for content, brotli or gzip encoded when it is at least
+    minimum_size bytes and the client accepts it
+
+    A strong ETag becomes weak on an encoded response, since the bytes differ.
+    """
+    headers = {name: value for name, value in (headers or {}).items() if name.lower() != "content-length"}
+    response = BSONResponse(content, headers=headers)
+    response.headers["Vary"] = "Accept-Encoding"
+    if not accept_encoding or len(response.body) < minimum_size:
+        return response
+
+    accepted = _accepted(accept_encoding)
+    default = accepted.get("*", 0.0)
+    if brotli is not None and accepted.get("br", default) > 0 and accepted.get("br", default) >= accepted.get("gzip", default):
+        response.body = brotli.compress(response.body, quality=4)
+        response.headers["Content-Encoding"] = "br"
+    elif accepted.get("gzip", default) > 0:
+        response.body = gzip.compress(response.body, compresslevel=6, mtime=0)
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        return response
+
+    response.headers["Content-Length"] = str(len(response.body))
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        response.headers["ETag"] = f"W/{etag}"
+    return response
+
+
+class BSONRoute(APIRoute):
+    """Route that renders plain return values with BSONResponse
+
+    FastAPI runs jsonable_encoder on anything that is not a Response before
+    handing it to the response class; wrapping the endpoint skips that pass.
+    Headers and status set on an injected Response are carried over the same
+    way FastAPI does it.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        @functools.wraps(endpoint)
+        async def render(**values: Any) -> Response:
+            content = await endpoint(**values)
+            if isinstance(content, Response):
+                return content
+
+            response = BSONResponse(content)
+            for value in values.values():
+                if isinstance(value, Response):
+                    if value.status_code:
+                        response.status_code = value.status_code
+                    response.headers.raw.extend(value.headers.raw)
+            return response
+
+        super().__init__(path, render, **kwargs)
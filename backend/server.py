@@ -1,26 +1,391 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Header, Query, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import OperationFailure
+from pymongo.read_preferences import SecondaryPreferred
 import os
 import logging
+import asyncio
+import secrets
+import hashlib
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict, Any
-from datetime import datetime
-from bson import ObjectId
+from typing import List, Optional, Dict, Any, Literal, Annotated, Awaitable, Callable
+from datetime import datetime, timedelta, timezone
+from cache import BatchLoader, DocumentCache, SingleFlight
+from write_behind import WriteBehindBuffer
+from responses import BSONResponse, BSONRoute, compressed
+import metrics
+from admission import AdmissionController, TokenBuckets
+import export
+import logs
+import consistency
+import analytics
+import stats
+from events import EventLog
+from payload import FieldLimits, PayloadLimitMiddleware, RouteLimits
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# MongoDB connection, made by connect() when the app starts
+client = None
+db = None
+secondary_db = None
+pool_monitor = metrics.MongoPoolMonitor()
 
-# Create the main app
-app = FastAPI()
-api_router = APIRouter(prefix="/api")
+# With READ_PREFERENCE=secondaryPreferred, GET routes read from secondaries no
+# more than READ_MAX_STALENESS_SECONDS behind (MongoDB's minimum is 90). A
+# user's reads stay on the primary for READ_PIN_SECONDS after a write this
+# worker made or saw, or that the client reports with X-Last-Write, so they
+# read their own writes on any worker. Secondary reads are never cached.
+# Needs a replica set.
+READ_PREFERENCE = os.environ.get("READ_PREFERENCE", "primary")
+READ_MAX_STALENESS_SECONDS = int(os.environ.get("READ_MAX_STALENESS_SECONDS", "90"))
+READ_PIN_SECONDS = float(os.environ.get("READ_PIN_SECONDS", str(READ_MAX_STALENESS_SECONDS)))
+
+def pool_options() -> Dict[str, Any]:
+    """Connection pool settings from the MONGO_* environment variables"""
+    options = {
+        "maxPoolSize": int(os.environ.get("MONGO_MAX_POOL_SIZE", "100")),
+        # Opened by warm_up() before the app reports ready
+        "minPoolSize": int(os.environ.get("MONGO_MIN_POOL_SIZE", "10")),
+    }
+    if os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS"):
+        options["waitQueueTimeoutMS"] = int(os.environ["MONGO_WAIT_QUEUE_TIMEOUT_MS"])
+    if os.environ.get("MONGO_COMPRESSORS"):
+        # e.g. "zstd,snappy,zlib"; zstd and snappy need their Python packages
+        options["compressors"] = os.environ["MONGO_COMPRESSORS"]
+    return options
+
+def connect(mongo_client=None):
+    """Create the MongoDB client from the environment, or use the one given"""
+    global client, db, secondary_db
+    client = mongo_client or AsyncIOMotorClient(
+        os.environ['MONGO_URL'],
+        event_listeners=[metrics.MongoCommandTimer(), pool_monitor],
+        **pool_options()
+    )
+    db = client[os.environ['DB_NAME']]
+    secondary_db = client.get_database(
+        os.environ['DB_NAME'],
+        read_preference=SecondaryPreferred(max_staleness=READ_MAX_STALENESS_SECONDS)
+    ) if READ_PREFERENCE == "secondaryPreferred" else None
+    write_behind.db = db
+    event_log.db = db
+
+async def warm_up():
+    """Open minPoolSize connections now rather than on the first requests"""
+    await asyncio.gather(*[
+        client.admin.command("ping") for _ in range(pool_options()["minPoolSize"])
+    ])
+
+api_router = APIRouter(prefix="/api", route_class=BSONRoute)
+
+# Low-value timestamps such as last_active, written off the request path
+write_behind = WriteBehindBuffer(
+    None,
+    flush_interval=float(os.environ.get("WRITE_BEHIND_FLUSH_SECONDS", "5")),
+    max_batch=int(os.environ.get("WRITE_BEHIND_MAX_BATCH", "500"))
+)
+
+# Append-only history of what users did, written in batches to the events
+# time-series collection with per-hour counters in event_hours
+event_log = EventLog(
+    None,
+    flush_interval=float(os.environ.get("EVENT_LOG_FLUSH_SECONDS", "1")),
+    max_batch=int(os.environ.get("EVENT_LOG_MAX_BATCH", "1000")),
+    max_pending=int(os.environ.get("EVENT_LOG_MAX_PENDING", "100000")),
+    timeseries=os.environ.get("EVENT_LOG_TIMESERIES", "1") == "1"
+)
+
+# Per-email request rates by route group, and a cap on requests doing Mongo
+# work at once; excess requests are shed with 429/503 and Retry-After
+admission = AdmissionController(
+    groups={
+        "auth": TokenBuckets(
+            rate=float(os.environ.get("ADMISSION_AUTH_RATE", "1")),
+            burst=float(os.environ.get("ADMISSION_AUTH_BURST", "5"))
+        ),
+        "progress": TokenBuckets(
+            rate=float(os.environ.get("ADMISSION_PROGRESS_RATE", "5")),
+            burst=float(os.environ.get("ADMISSION_PROGRESS_BURST", "20"))
+        ),
+    },
+    max_in_flight=int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", "64")),
+    queue_timeout=float(os.environ.get("ADMISSION_QUEUE_TIMEOUT_SECONDS", "0.5"))
+)
+
+# Bounds on tool data, checked while the request body streams in so an
+# oversized or deeply nested blob is refused before it is parsed or stored
+TOOL_DATA_LIMITS = FieldLimits(
+    max_bytes=int(os.environ.get("TOOL_DATA_MAX_BYTES", "65536")),
+    max_depth=int(os.environ.get("TOOL_DATA_MAX_DEPTH", "8")),
+    max_keys=int(os.environ.get("TOOL_DATA_MAX_KEYS", "500"))
+)
+PAYLOAD_LIMITS = {
+    ("POST", "/api/progress/save-tool-data"): RouteLimits(
+        max_bytes=int(os.environ.get("SAVE_TOOL_DATA_MAX_BYTES", "131072")),
+        fields={"data": TOOL_DATA_LIMITS}
+    ),
+    ("POST", "/api/sync/batch"): RouteLimits(
+        max_bytes=int(os.environ.get("SYNC_BATCH_MAX_BYTES", "2097152")),
+        fields={"operations.*.data": TOOL_DATA_LIMITS}
+    ),
+}
+
+# Progress responses at least this large are sent brotli/gzip encoded
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+
+# Shared secret for the /api/admin routes and the operational /api/stats,
+# /api/cache/stats and /api/metrics, sent as X-Admin-Token; they are disabled
+# while it is unset
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+# ==================== INDEXES ====================
+
+# How long a stored response answers replays of its Idempotency-Key
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", "86400"))
+
+# Every hot route filters on one of these keys. They are unique so that
+# concurrent first logins can't create duplicate user/progress documents.
+INDEXES = {
+    "users": [IndexModel([("email", ASCENDING)], unique=True, name="email_unique")],
+    "progress": [IndexModel([("user_email", ASCENDING)], unique=True, name="user_email_unique")],
+    "tool_data": [IndexModel([("user_email", ASCENDING), ("dia", ASCENDING)], unique=True, name="user_email_dia_unique")],
+    "idempotency_keys": [IndexModel([("created_at", ASCENDING)], expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS, name="created_at_ttl")],
+    "events": [IndexModel([("meta.user", ASCENDING), ("ts", ASCENDING)], name="user_ts")],
+    "event_hours": [IndexModel([("hour", ASCENDING), ("type", ASCENDING)], unique=True, name="hour_type_unique")],
+}
+
+# One entry per query shape issued by the routes, checked by check_query_plans()
+QUERY_SHAPES = [
+    ("users", {"email": "plan-check@example.com"}),
+    ("users", {"email": {"$in": ["plan-check@example.com", "plan-check-2@example.com"]}}),
+    ("progress", {"user_email": "plan-check@example.com"}),
+    ("progress", {"user_email": {"$in": ["plan-check@example.com", "plan-check-2@example.com"]}}),
+    ("progress", {"user_email": "plan-check@example.com", "dias_completados": {"$ne": 1}}),
+    ("tool_data", {"user_email": "plan-check@example.com", "dia": 1}),
+    ("tool_data", {"user_email": "plan-check@example.com", "updated_at": {"$gt": datetime(2000, 1, 1)}}),
+    ("idempotency_keys", {"_id": "complete-day:plan-check"}),
+    ("events", {"meta.user": "plan-check@example.com", "ts": {"$gt": datetime(2000, 1, 1)}}),
+    ("event_hours", {"hour": {"$gte": datetime(2000, 1, 1)}}),
+]
+
+async def ensure_indexes():
+    """Create the indexes declared in INDEXES"""
+    # Must exist before an index would create it as a regular collection
+    await event_log.create_collection()
+    for collection, indexes in INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            # Usually duplicates left over from before the index existed
+            logging.error("Index creation error on %s: %s", collection, e, exc_info=e)
+
+def _plan_stages(plan):
+    """Yield every stage name in an explain() plan tree"""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+async def check_query_plans():
+    """Raise if any query shape in QUERY_SHAPES is answered by a collection scan"""
+    for collection, query in QUERY_SHAPES:
+        explain = await db[collection].find(query).explain()
+        if "COLLSCAN" in _plan_stages(explain["queryPlanner"]["winningPlan"]):
+            raise RuntimeError(f"COLLSCAN on {collection} for query {query}")
+
+# ==================== CACHE ====================
+
+# Read-through caches for get_user / get_progress, keyed by email. Write
+# routes invalidate their own worker's entry; other workers see the change
+# after CACHE_TTL_SECONDS, or immediately when CACHE_INVALIDATION_FEED=1
+# (needs a replica set for change streams).
+user_cache = DocumentCache(
+    max_size=int(os.environ.get("CACHE_MAX_SIZE", "10000")),
+    ttl=float(os.environ.get("CACHE_TTL_SECONDS", "30"))
+)
+progress_cache = DocumentCache(
+    max_size=int(os.environ.get("CACHE_MAX_SIZE", "10000")),
+    ttl=float(os.environ.get("CACHE_TTL_SECONDS", "30"))
+)
+
+# Concurrent cache misses for the same document share one query
+single_flight = SingleFlight()
+
+# Emails whose reads go to the primary, see READ_PREFERENCE
+read_pins = DocumentCache(
+    max_size=int(os.environ.get("READ_PIN_MAX_SIZE", "100000")),
+    ttl=READ_PIN_SECONDS
+)
+
+def reader(email: Optional[str] = None):
+    """Database handle for a read on behalf of email"""
+    if secondary_db is None or (email and read_pins.get(email)):
+        return db
+    if time.time() - consistency.last_write() < READ_PIN_SECONDS:
+        return db
+    return secondary_db
+
+def pin_reads(email: str):
+    """Send email's reads to the primary for the next READ_PIN_SECONDS"""
+    if secondary_db is not None:
+        read_pins.set(email, True)
+
+def fetch_by_email(collection: str, field: str, projection: Optional[Dict[str, Any]] = None):
+    """Batch fetch for a BatchLoader keyed by (email, primary): one $in query per database handle
+
+    Whether to read the primary is decided by the caller, since the batch is
+    fetched outside the request that asked for each key.
+    """
+    async def fetch(keys: List[tuple]) -> Dict[tuple, Dict[str, Any]]:
+        groups: Dict[bool, List[str]] = {}
+        for email, primary in keys:
+            groups.setdefault(primary, []).append(email)
+
+        found = {}
+        for primary, emails in groups.items():
+            handle = db if primary else secondary_db
+            async for doc in handle[collection].find({field: {"$in": emails}}, projection):
+                found[(doc[field], primary)] = doc
+
+        metrics.mongo_batch_size.observe((collection,), len(keys))
+        metrics.mongo_round_trips_saved_total.inc((collection,), len(keys) - len(groups))
+        return found
+    return fetch
+
+# Cache misses for different emails within BATCH_WINDOW_MS of each other are
+# fetched with one $in query per collection
+user_loader = BatchLoader(
+    fetch_by_email("users", "email"),
+    window=float(os.environ.get("BATCH_WINDOW_MS", "1")) / 1000,
+    max_batch=int(os.environ.get("BATCH_MAX_SIZE", "100"))
+)
+# Tool data lives in its own collection; only legacy documents still embed it
+progress_loader = BatchLoader(
+    fetch_by_email("progress", "user_email", {"tool_data": 0}),
+    window=float(os.environ.get("BATCH_WINDOW_MS", "1")) / 1000,
+    max_batch=int(os.environ.get("BATCH_MAX_SIZE", "100"))
+)
+
+def invalidate_user(email: str):
+    user_cache.invalidate(email)
+    single_flight.forget(("users", email, True))
+    single_flight.forget(("users", email, False))
+    pin_reads(email)
+
+def invalidate_progress(email: str):
+    progress_cache.invalidate(email)
+    single_flight.forget(("progress", email, True))
+    single_flight.forget(("progress", email, False))
+    pin_reads(email)
+
+async def load_user(email: str) -> Optional[Dict[str, Any]]:
+    """User document by email, read through user_cache"""
+    user = user_cache.get(email)
+    if user is None:
+        generation = user_cache.generation
+        primary = reader(email) is db
+        user = await single_flight.do(("users", email, primary), user_loader.load, (email, primary))
+        # A secondary read may be stale, and caching it would serve it on the primary's behalf
+        if user and primary:
+            user_cache.set(email, user, generation)
+    return user
+
+async def load_progress(email: str) -> Optional[Dict[str, Any]]:
+    """Progress document by user email, read through progress_cache"""
+    progress = progress_cache.get(email)
+    if progress is None:
+        generation = progress_cache.generation
+        primary = reader(email) is db
+        progress = await single_flight.do(("progress", email, primary), progress_loader.load, (email, primary))
+        if progress and primary:
+            progress_cache.set(email, progress, generation)
+    return progress
+
+async def load_progress_version(email: str) -> Optional[datetime]:
+    """updated_at of a progress document, without loading the whole document"""
+    progress = progress_cache.get(email)
+    if progress is None:
+        progress = await reader(email).progress.find_one({"user_email": email}, {"_id": 0, "updated_at": 1})
+    return progress.get("updated_at") if progress else None
+
+async def load_progress_fields(email: str, fields: List[str]) -> Optional[Dict[str, Any]]:
+    """Only the given progress fields, sliced from the cache or projected in Mongo"""
+    progress = progress_cache.get(email)
+    if progress is not None:
+        return {field: progress[field] for field in fields if field in progress}
+    
+    return await reader(email).progress.find_one({"user_email": email}, {field: 1 for field in fields})
+
+async def load_tool_data_since(email: str, since: datetime) -> Dict[str, Any]:
+    """Tool data days saved after since, keyed like the legacy dia_N map"""
+    if since.tzinfo:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    cursor = reader(email).tool_data.find(
+        {"user_email": email, "updated_at": {"$gt": since}},
+        {"_id": 0, "dia": 1, "data": 1}
+    )
+    return {f"dia_{doc['dia']}": doc["data"] async for doc in cursor}
+
+def progress_etag(
+    updated_at: datetime,
+    fields: Optional[List[str]] = None,
+    since: Optional[datetime] = None
+) -> str:
+    """Strong ETag for a progress representation: its updated_at, plus a
+    digest of the fields= projection and since= slice when there are any"""
+    if not fields and not since:
+        return f'"{updated_at.isoformat()}"'
+    variant = f"{','.join(fields or [])}|{since.isoformat() if since else ''}"
+    return f'"{updated_at.isoformat()}-{hashlib.sha1(variant.encode()).hexdigest()[:12]}"'
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """Weak comparison of etag with an If-None-Match list, as 304 revalidation uses"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+async def watch_cache_invalidations():
+    """Evict cache entries changed by any worker, using change streams"""
+    pipeline = [{"$project": {
+        "operationType": 1,
+        "ns": 1,
+        "fullDocument.email": 1,
+        "fullDocument.user_email": 1,
+    }}]
+    while True:
+        try:
+            async with db.watch(pipeline, full_document="updateLookup") as stream:
+                async for change in stream:
+                    document = change.get("fullDocument") or {}
+                    if change["ns"]["coll"] == "users" and "email" in document:
+                        invalidate_user(document["email"])
+                    elif change["ns"]["coll"] == "progress" and "user_email" in document:
+                        invalidate_progress(document["user_email"])
+                    elif change["operationType"] in ("delete", "drop", "dropDatabase", "invalidate"):
+                        user_cache.clear()
+                        progress_cache.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error("Cache invalidation feed error: %s", e, exc_info=e)
+            # Events may have been missed while the stream was down
+            user_cache.clear()
+            progress_cache.clear()
+            await asyncio.sleep(5)
 
 # ==================== MODELS ====================
 
@@ -44,7 +409,7 @@ class Progress(BaseModel):
     pontos_totais: int = 0
     tempo_limpo_inicio: Optional[datetime] = None
     medalhas: List[str] = []
-    tool_data: Dict[str, Any] = {}
+    tool_data_updated_at: Dict[str, datetime] = {}
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 class CompleteDayRequest(BaseModel):
@@ -57,23 +422,232 @@ class SaveToolDataRequest(BaseModel):
     dia: int
     data: Dict[str, Any]
 
+class SyncOperation(BaseModel):
+    type: Literal["complete_day", "save_tool_data"]
+    dia: int
+    pontos: int = 0
+    data: Dict[str, Any] = {}
+
+class SyncBatchRequest(BaseModel):
+    email: str
+    operations: List[SyncOperation] = Field(max_length=200)
+
+# ==================== MEDALS ====================
+
+# A medal is awarded the first time its requirements hold after a day is
+# completed: every day in "dias" completed and at least "pontos" points.
+# Rules are evaluated inside the complete-day update, so adding one costs
+# no extra round trip.
+MEDAL_RULES = [
+    {"medalha": "primeira_vitoria", "dias": [1]},
+    {"medalha": "guerreiro_3_dias", "dias": [3]},
+]
+
+def _medal_condition(rule: Dict[str, Any]) -> Dict[str, Any]:
+    """Aggregation expression for a rule, evaluated on the updated document"""
+    return {"$and": [
+        *[{"$in": [dia, "$dias_completados"]} for dia in rule.get("dias", [])],
+        {"$gte": ["$pontos_totais", rule.get("pontos", 0)]},
+    ]}
+
+def complete_day_pipeline(dia: int, pontos: int, now: datetime) -> List[Dict[str, Any]]:
+    """Update pipeline that completes a day and awards any medals it unlocks"""
+    return [
+        {"$set": {
+            "dias_completados": {"$concatArrays": [{"$ifNull": ["$dias_completados", []]}, [dia]]},
+            "pontos_totais": {"$add": [{"$ifNull": ["$pontos_totais", 0]}, pontos]},
+            "medalhas": {"$ifNull": ["$medalhas", []]},
+            "dia_atual": min(dia + 1, 7),
+            "updated_at": now,
+        }},
+        {"$set": {
+            "medalhas": {"$concatArrays": ["$medalhas", *[
+                {"$cond": [
+                    {"$and": [{"$not": [{"$in": [rule["medalha"], "$medalhas"]}]}, _medal_condition(rule)]},
+                    [rule["medalha"]],
+                    [],
+                ]}
+                for rule in MEDAL_RULES
+            ]]},
+        }},
+    ]
+
+def earned_medals(before: Dict[str, Any], dia: int, pontos: int) -> List[str]:
+    """Medals the pipeline awarded, given the document as it was before the update"""
+    dias = set(before.get("dias_completados", [])) | {dia}
+    total = before.get("pontos_totais", 0) + pontos
+    medalhas = before.get("medalhas", [])
+    return [
+        rule["medalha"] for rule in MEDAL_RULES
+        if set(rule.get("dias", [])) <= dias
+        and total >= rule.get("pontos", 0)
+        and rule["medalha"] not in medalhas
+    ]
+
+# ==================== TOOL DATA ====================
+
+# Previous versions kept per (user_email, dia) document
+TOOL_DATA_HISTORY = int(os.environ.get("TOOL_DATA_HISTORY", "10"))
+
+def save_tool_data_update(dia: int, now: datetime) -> Dict[str, Any]:
+    """Progress update recording that a day's tool data was saved"""
+    return {
+        "$set": {
+            f"tool_data_updated_at.dia_{dia}": now,
+            "updated_at": now
+        },
+        # Drop the copy embedded by older versions of this route
+        "$unset": {f"tool_data.dia_{dia}": ""}
+    }
+
+def tool_data_pipeline(data: Dict[str, Any], now: datetime) -> List[Dict[str, Any]]:
+    """Upsert pipeline storing a new version of a day's tool data"""
+    previous = {"version": "$version", "data": "$data", "updated_at": "$updated_at"}
+    return [{"$set": {
+        "history": {"$slice": [
+            {"$concatArrays": [
+                {"$ifNull": ["$history", []]},
+                {"$cond": [{"$ifNull": ["$version", False]}, [previous], []]},
+            ]},
+            -TOOL_DATA_HISTORY,
+        ]},
+        "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+        "data": {"$literal": data},
+        "updated_at": now,
+    }}]
+
+# ==================== IDEMPOTENCY ====================
+
+# A claimed key with no stored response is treated as abandoned after this
+IDEMPOTENCY_PENDING_SECONDS = 30
+
+def idempotency_key_id(route: str, email: str, key: str) -> str:
+    return f"{route}:{email}:{key}"
+
+def request_fingerprint(request: BaseModel) -> str:
+    """Hash of a request body, to tell a replay from a different request reusing its key"""
+    return hashlib.sha256(request.model_dump_json().encode()).hexdigest()
+
+async def claim_idempotency_key(route: str, email: str, key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """Claim a key, or return the response stored by the request that used it first
+    
+    Keys are scoped to the route and the user, and a key reused with a
+    different body is refused with 422.
+    """
+    now = datetime.utcnow()
+    key_id = idempotency_key_id(route, email, key)
+    stored = await db.idempotency_keys.find_one_and_update(
+        {"_id": key_id},
+        {"$setOnInsert": {"created_at": now, "fingerprint": fingerprint}},
+        upsert=True
+    )
+    if stored is None:
+        return None
+    if stored.get("fingerprint") != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key já usada com outra requisição")
+    if "response" in stored:
+        return stored["response"]
+    if (now - stored["created_at"]).total_seconds() < IDEMPOTENCY_PENDING_SECONDS:
+        raise HTTPException(status_code=409, detail="Requisição com esta Idempotency-Key em andamento")
+    
+    # The first request died before answering; take the key over
+    await db.idempotency_keys.update_one({"_id": key_id}, {"$set": {"created_at": now}})
+    return None
+
+async def idempotent(
+    route: str,
+    key: Optional[str],
+    operation: Callable[..., Awaitable[Dict[str, Any]]],
+    request: BaseModel
+) -> Dict[str, Any]:
+    """Run operation once per Idempotency-Key, answering replays with the stored response"""
+    if not key:
+        return await operation(request)
+    
+    key_id = idempotency_key_id(route, request.email, key)
+    try:
+        stored = await claim_idempotency_key(route, request.email, key, request_fingerprint(request))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error("Idempotency error: %s", e, exc_info=e)
+        raise HTTPException(status_code=500, detail=str(e))
+    if stored is not None:
+        return stored
+    
+    try:
+        response = await operation(request)
+    except BaseException:
+        # Let the client retry with the same key
+        await db.idempotency_keys.delete_one({"_id": key_id})
+        raise
+    
+    try:
+        await db.idempotency_keys.update_one({"_id": key_id}, {"$set": {"response": response}})
+    except Exception as e:
+        # The write went through; a retry meanwhile gets 409, then reruns the
+        # operation once the pending claim expires
+        logging.error("Idempotency store error: %s", e, exc_info=e)
+    return response
+
+# ==================== STATS ====================
+
+def record_stats(*buckets: stats.Buckets):
+    """Queue counter increments for the stats collection
+    
+    They go through the write-behind buffer, so the hot totals document gets
+    one write per flush instead of one per request.
+    """
+    for key, counters in stats.merge_buckets(*buckets).items():
+        write_behind.inc("stats", {"_id": key}, counters)
+
+# ==================== ADMIN ====================
+
+# Analytics reports scan every user, so each cohort granularity is computed
+# at most once per ANALYTICS_TTL_SECONDS
+analytics_cache = DocumentCache(
+    max_size=len(analytics.COHORT_PERIODS),
+    ttl=float(os.environ.get("ANALYTICS_TTL_SECONDS", "300"))
+)
+
+async def require_admin(x_admin_token: Annotated[Optional[str], Header()] = None):
+    if not ADMIN_TOKEN or not secrets.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Acesso negado")
+
 # ==================== ROUTES ====================
 
-@api_router.post("/auth/login")
+@api_router.post("/auth/login", dependencies=[Depends(admission.limit("auth"))])
 async def login(request: LoginRequest):
     """Simple email-based login"""
     try:
-        # Check if user exists
-        user = await db.users.find_one({"email": request.email})
+        now = datetime.utcnow()
+        user = await load_user(request.email)
+        
+        if not user:
+            # Upsert the user in one round trip; the pre-image is None only
+            # for the request that created the user
+            new_user = User(email=request.email, created_at=now).dict(exclude={"email", "last_active"})
+            user = await db.users.find_one_and_update(
+                {"email": request.email},
+                {"$set": {"last_active": now}, "$setOnInsert": new_user},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+            )
+            invalidate_user(request.email)
+        else:
+            # Nobody reads last_active in real time, so it is written behind
+            write_behind.set("users", {"email": request.email}, {"last_active": now})
+        record_stats(stats.login_counters(now, is_new=not user))
+        event_log.emit(request.email, "login" if user else "signup", ts=now)
         
         if not user:
-            # Create new user
-            user_data = User(email=request.email).dict()
-            await db.users.insert_one(user_data)
-            
             # Create initial progress
-            progress_data = Progress(user_email=request.email).dict()
-            await db.progress.insert_one(progress_data)
+            progress_data = Progress(user_email=request.email).dict(exclude={"user_email"})
+            await db.progress.update_one(
+                {"user_email": request.email},
+                {"$setOnInsert": progress_data},
+                upsert=True
+            )
             
             return {
                 "success": True,
@@ -82,12 +656,6 @@ async def login(request: LoginRequest):
                 "is_new": True
             }
         else:
-            # Update last active
-            await db.users.update_one(
-                {"email": request.email},
-                {"$set": {"last_active": datetime.utcnow()}}
-            )
-            
             return {
                 "success": True,
                 "message": "Login bem-sucedido",
@@ -96,26 +664,40 @@ async def login(request: LoginRequest):
                 "has_onboarding": user.get("vicio_alvo") is not None
             }
     except Exception as e:
-        logging.error(f"Login error: {e}")
+        logging.error("Login error: %s", e, exc_info=e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.post("/auth/onboarding")
-async def complete_onboarding(request: OnboardingRequest):
+@api_router.post("/auth/onboarding", dependencies=[Depends(admission.limit("auth"))])
+async def complete_onboarding(
+    request: OnboardingRequest,
+    idempotency_key: Annotated[Optional[str], Header()] = None
+):
     """Complete onboarding with target addiction"""
+    return await idempotent("onboarding", idempotency_key, apply_complete_onboarding, request)
+
+async def apply_complete_onboarding(request: OnboardingRequest):
     try:
-        result = await db.users.update_one(
+        # The pre-image tells the stats which category the user leaves, if any
+        user = await db.users.find_one_and_update(
             {"email": request.email},
-            {"$set": {"vicio_alvo": request.vicio_alvo}}
+            {"$set": {"vicio_alvo": request.vicio_alvo}},
+            projection={"vicio_alvo": 1}
         )
         
-        if result.modified_count == 0:
+        invalidate_user(request.email)
+        if user is None:
             raise HTTPException(status_code=404, detail="Usuário não encontrado")
         
         # Start tempo limpo counter
-        await db.progress.update_one(
+        now = datetime.utcnow()
+        progress = await db.progress.find_one_and_update(
             {"user_email": request.email},
-            {"$set": {"tempo_limpo_inicio": datetime.utcnow()}}
+            {"$set": {"tempo_limpo_inicio": now, "updated_at": now}},
+            projection={"pontos_totais": 1, "dias_completados": 1}
         )
+        invalidate_progress(request.email)
+        record_stats(stats.onboarding_counters(now, user.get("vicio_alvo"), request.vicio_alvo, progress))
+        event_log.emit(request.email, "onboarding", ts=now)
         
         return {
             "success": True,
@@ -124,117 +706,174 @@ async def complete_onboarding(request: OnboardingRequest):
     except HTTPException:
         raise
     except Exception as e:
-        logging.error(f"Onboarding error: {e}")
+        logging.error("Onboarding error: %s", e, exc_info=e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/user/{email}")
+@api_router.get("/user/{email}", dependencies=[Depends(admission.limit("progress"))])
 async def get_user(email: str):
     """Get user data"""
     try:
-        user = await db.users.find_one({"email": email})
+        user = await load_user(email)
         if not user:
             raise HTTPException(status_code=404, detail="Usuário não encontrado")
         
-        # Convert ObjectId to string
-        user["_id"] = str(user["_id"])
         return user
     except HTTPException:
         raise
     except Exception as e:
-        logging.error(f"Get user error: {e}")
+        logging.error("Get user error: %s", e, exc_info=e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/progress/{email}")
-async def get_progress(email: str):
-    """Get user progress"""
+@api_router.get("/progress/{email}", dependencies=[Depends(admission.limit("progress"))])
+async def get_progress(
+    email: str,
+    response: Response,
+    fields: Optional[str] = None,
+    since: Optional[datetime] = None,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+    accept_encoding: Annotated[Optional[str], Header()] = None
+):
+    """Get user progress
+    
+    fields is a comma-separated list of fields to return (_id and updated_at
+    are always included). since adds tool_data with the days saved after it.
+    """
     try:
-        progress = await db.progress.find_one({"user_email": email})
+        selected = None
+        if fields:
+            selected = {field.strip() for field in fields.split(",") if field.strip()}
+            unknown = selected - set(Progress.model_fields)
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Campos inválidos: {', '.join(sorted(unknown))}")
+            selected = sorted(selected | {"_id", "updated_at"})
+        
+        # The body may be compressed, and the ETag is the same for every encoding
+        response.headers["Vary"] = "Accept-Encoding"
+        
+        # Revalidate with the updated_at alone before loading the document
+        if if_none_match:
+            updated_at = await load_progress_version(email)
+            if updated_at and etag_matches(progress_etag(updated_at, selected, since), if_none_match):
+                return Response(
+                    status_code=304,
+                    headers={"ETag": progress_etag(updated_at, selected, since), "Vary": "Accept-Encoding"}
+                )
+        
+        if selected:
+            progress = await load_progress_fields(email, selected)
+        else:
+            progress = await load_progress(email)
         if not progress:
             raise HTTPException(status_code=404, detail="Progresso não encontrado")
         
-        # Convert ObjectId to string
-        progress["_id"] = str(progress["_id"])
+        if since:
+            progress = {**progress, "tool_data": await load_tool_data_since(email, since)}
+        
+        if progress.get("updated_at"):
+            response.headers["ETag"] = progress_etag(progress["updated_at"], selected, since)
+        if accept_encoding:
+            return compressed(progress, accept_encoding, response.headers, COMPRESSION_MIN_BYTES)
         return progress
     except HTTPException:
         raise
     except Exception as e:
-        logging.error(f"Get progress error: {e}")
+        logging.error("Get progress error: %s", e, exc_info=e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.post("/progress/complete-day")
-async def complete_day(request: CompleteDayRequest):
-    """Mark a day as complete and award points"""
+@api_router.get("/session/{email}", dependencies=[Depends(admission.limit("progress"))])
+async def get_session(email: str):
+    """Get user data and progress in one call"""
     try:
-        progress = await db.progress.find_one({"user_email": request.email})
+        user, progress = await asyncio.gather(load_user(email), load_progress(email))
+        if not user:
+            raise HTTPException(status_code=404, detail="Usuário não encontrado")
         if not progress:
             raise HTTPException(status_code=404, detail="Progresso não encontrado")
         
-        # Check if day already completed
-        if request.dia in progress.get("dias_completados", []):
+        return {
+            "user": user,
+            "progress": progress
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error("Get session error: %s", e, exc_info=e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/progress/complete-day", dependencies=[Depends(admission.limit("progress"))])
+async def complete_day(
+    request: CompleteDayRequest,
+    idempotency_key: Annotated[Optional[str], Header()] = None
+):
+    """Mark a day as complete and award points"""
+    return await idempotent("complete-day", idempotency_key, apply_complete_day, request)
+
+async def apply_complete_day(request: CompleteDayRequest):
+    try:
+        # Only matches while the day is still open, so retries can't double-count
+        now = datetime.utcnow()
+        progress = await db.progress.find_one_and_update(
+            {"user_email": request.email, "dias_completados": {"$ne": request.dia}},
+            complete_day_pipeline(request.dia, request.pontos, now),
+            projection={"dias_completados": 1, "pontos_totais": 1, "medalhas": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        invalidate_progress(request.email)
+        
+        if not progress:
+            if not await db.progress.count_documents({"user_email": request.email}, limit=1):
+                raise HTTPException(status_code=404, detail="Progresso não encontrado")
+            
             return {
                 "success": True,
                 "message": "Dia já estava completo",
                 "already_completed": True
             }
         
-        # Update progress
-        update_data = {
-            "$addToSet": {"dias_completados": request.dia},
-            "$inc": {"pontos_totais": request.pontos},
-            "$set": {
-                "dia_atual": request.dia + 1 if request.dia < 7 else 7,
-                "updated_at": datetime.utcnow()
-            }
-        }
-        
-        # Award medals
-        medalhas = progress.get("medalhas", [])
-        new_medalhas = []
-        
-        if request.dia == 1 and "primeira_vitoria" not in medalhas:
-            new_medalhas.append("primeira_vitoria")
-        
-        if request.dia == 3 and "guerreiro_3_dias" not in medalhas:
-            new_medalhas.append("guerreiro_3_dias")
-        
-        if new_medalhas:
-            update_data["$addToSet"]["medalhas"] = {"$each": new_medalhas}
-        
-        await db.progress.update_one(
-            {"user_email": request.email},
-            update_data
-        )
+        user = await load_user(request.email)
+        record_stats(stats.complete_day_counters(now, user and user.get("vicio_alvo"), request.dia, request.pontos))
+        event_log.emit(request.email, "complete_day", request.dia, request.pontos, ts=now)
         
         return {
             "success": True,
             "message": f"Dia {request.dia} completo!",
             "pontos_ganhos": request.pontos,
-            "novas_medalhas": new_medalhas,
+            "novas_medalhas": earned_medals(progress, request.dia, request.pontos),
             "already_completed": False
         }
     except HTTPException:
         raise
     except Exception as e:
-        logging.error(f"Complete day error: {e}")
+        logging.error("Complete day error: %s", e, exc_info=e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.post("/progress/save-tool-data")
-async def save_tool_data(request: SaveToolDataRequest):
+@api_router.post("/progress/save-tool-data", dependencies=[Depends(admission.limit("progress"))])
+async def save_tool_data(
+    request: SaveToolDataRequest,
+    idempotency_key: Annotated[Optional[str], Header()] = None
+):
     """Save data from day tools"""
+    return await idempotent("save-tool-data", idempotency_key, apply_save_tool_data, request)
+
+async def apply_save_tool_data(request: SaveToolDataRequest):
     try:
+        now = datetime.utcnow()
         result = await db.progress.update_one(
             {"user_email": request.email},
-            {
-                "$set": {
-                    f"tool_data.dia_{request.dia}": request.data,
-                    "updated_at": datetime.utcnow()
-                }
-            }
+            save_tool_data_update(request.dia, now)
         )
         
-        if result.modified_count == 0:
+        if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Progresso não encontrado")
         
+        await db.tool_data.update_one(
+            {"user_email": request.email, "dia": request.dia},
+            tool_data_pipeline(request.data, now),
+            upsert=True
+        )
+        invalidate_progress(request.email)
+        event_log.emit(request.email, "save_tool_data", request.dia, ts=now)
+        
         return {
             "success": True,
             "message": "Dados salvos com sucesso"
@@ -242,32 +881,328 @@ async def save_tool_data(request: SaveToolDataRequest):
     except HTTPException:
         raise
     except Exception as e:
-        logging.error(f"Save tool data error: {e}")
+        logging.error("Save tool data error: %s", e, exc_info=e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/tool-data/{email}/{dia}", dependencies=[Depends(admission.limit("progress"))])
+async def get_tool_data(email: str, dia: int, history: bool = False):
+    """Get the tool data saved for a day"""
+    try:
+        tool_data = await reader(email).tool_data.find_one(
+            {"user_email": email, "dia": dia},
+            {"_id": 0} if history else {"_id": 0, "history": 0}
+        )
+        if tool_data:
+            return tool_data
+        
+        # Days saved before tool data had its own collection
+        progress = await reader(email).progress.find_one({"user_email": email}, {f"tool_data.dia_{dia}": 1})
+        if not progress:
+            raise HTTPException(status_code=404, detail="Progresso não encontrado")
+        
+        return {
+            "user_email": email,
+            "dia": dia,
+            "data": progress.get("tool_data", {}).get(f"dia_{dia}", {}),
+            "version": 0
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error("Get tool data error: %s", e, exc_info=e)
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/sync/batch", dependencies=[Depends(admission.limit("progress"))])
+async def sync_batch(
+    request: SyncBatchRequest,
+    idempotency_key: Annotated[Optional[str], Header()] = None
+):
+    """Apply a queue of offline operations
+    
+    Completions are applied first, in queue order, with one round trip each
+    so that every one reports its own medals. Tool data saves follow as one
+    bulk write per collection. Results come back in queue order.
+    """
+    return await idempotent("sync-batch", idempotency_key, apply_sync_batch, request)
+
+async def apply_sync_batch(request: SyncBatchRequest):
+    try:
+        now = datetime.utcnow()
+        results = []
+        completed = []
+        saved = []
+        for op in request.operations:
+            if op.type == "save_tool_data":
+                saved.append(op)
+                results.append({"type": op.type, "dia": op.dia, "success": True})
+                continue
+            
+            # Each completion is applied on its own like complete-day: the
+            # pre-image tells whether this request completed the day, and
+            # which medals that awarded, even with concurrent writers
+            before = await db.progress.find_one_and_update(
+                {"user_email": request.email, "dias_completados": {"$ne": op.dia}},
+                complete_day_pipeline(op.dia, op.pontos, now),
+                projection={"dias_completados": 1, "pontos_totais": 1, "medalhas": 1},
+                return_document=ReturnDocument.BEFORE
+            )
+            if before is None:
+                results.append({"type": op.type, "dia": op.dia, "success": True, "already_completed": True})
+                continue
+            
+            completed.append(op)
+            results.append({
+                "type": op.type,
+                "dia": op.dia,
+                "success": True,
+                "pontos_ganhos": op.pontos,
+                "novas_medalhas": earned_medals(before, op.dia, op.pontos),
+                "already_completed": False
+            })
+        
+        if saved:
+            result = await db.progress.bulk_write([
+                UpdateOne({"user_email": request.email}, save_tool_data_update(op.dia, now))
+                for op in saved
+            ], ordered=True)
+            if result.matched_count == 0:
+                saved = []
+            else:
+                await db.tool_data.bulk_write([
+                    UpdateOne(
+                        {"user_email": request.email, "dia": op.dia},
+                        tool_data_pipeline(op.data, now),
+                        upsert=True
+                    )
+                    for op in saved
+                ], ordered=True)
+        if completed or saved:
+            invalidate_progress(request.email)
+        elif not await db.progress.count_documents({"user_email": request.email}, limit=1):
+            raise HTTPException(status_code=404, detail="Progresso não encontrado")
+        
+        if completed:
+            user = await load_user(request.email)
+            vicio_alvo = user and user.get("vicio_alvo")
+            record_stats(*[stats.complete_day_counters(now, vicio_alvo, op.dia, op.pontos) for op in completed])
+        for op in completed:
+            event_log.emit(request.email, op.type, op.dia, op.pontos, ts=now)
+        for op in saved:
+            event_log.emit(request.email, op.type, op.dia, ts=now)
+        
+        return {
+            "success": True,
+            "results": results
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error("Sync batch error: %s", e, exc_info=e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/admin/export", dependencies=[Depends(require_admin)])
+async def export_users(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    vicio_alvo: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: Annotated[Optional[int], Query(ge=1)] = None
+):
+    """Stream users joined with their progress, in _id order
+    
+    after is the last _id of a previous export, to resume it.
+    """
+    try:
+        query = export.export_query(created_after, created_before, vicio_alvo, after)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Cursor after inválido: {after}")
+    
+    return StreamingResponse(
+        export.export_stream(reader(), query, format, limit=limit, header=after is None),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'}
+    )
+
+@api_router.get("/admin/analytics", dependencies=[Depends(require_admin)])
+async def get_analytics(cohort: Literal["day", "week", "month"] = "week"):
+    """Completion funnel, retention by signup cohort and points distribution"""
+    try:
+        report = analytics_cache.get(cohort)
+        if report is None:
+            report = await single_flight.do(("analytics", cohort), analytics.cohort_report, reader(), cohort)
+            analytics_cache.set(cohort, report)
+        
+        return report
+    except Exception as e:
+        logging.error("Analytics error: %s", e, exc_info=e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/events/{email}", dependencies=[Depends(admission.limit("progress"))])
+async def get_events(
+    email: str,
+    since: Optional[datetime] = None,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100
+):
+    """A user's events, oldest first"""
+    try:
+        query: Dict[str, Any] = {"meta.user": email}
+        if since:
+            if since.tzinfo:
+                since = since.astimezone(timezone.utc).replace(tzinfo=None)
+            query["ts"] = {"$gt": since}
+        cursor = reader(email).events.find(query, {"_id": 0, "meta.user": 0}).sort("ts", ASCENDING).limit(limit)
+        return {
+            "events": [
+                {"type": event.pop("meta")["type"], **event}
+                async for event in cursor
+            ]
+        }
+    except Exception as e:
+        logging.error("Get events error: %s", e, exc_info=e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/admin/activity", dependencies=[Depends(require_admin)])
+async def get_activity(
+    hours: Annotated[int, Query(ge=1, le=24 * 90)] = 24,
+    type: Optional[str] = None
+):
+    """Events per hour and type over the last hours, from the hourly counters"""
+    try:
+        now = datetime.utcnow()
+        query: Dict[str, Any] = {"hour": {"$gte": now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)}}
+        if type:
+            query["type"] = type
+        cursor = reader().event_hours.find(query, {"_id": 0}).sort([("hour", ASCENDING), ("type", ASCENDING)])
+        return {"hours": await cursor.to_list(None)}
+    except Exception as e:
+        logging.error("Get activity error: %s", e, exc_info=e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/stats", dependencies=[Depends(require_admin)])
+async def get_stats(days: Annotated[int, Query(ge=1, le=90)] = 7):
+    """Counters maintained by the write routes: totals, recent days and per vicio_alvo"""
+    try:
+        return await stats.read_stats(reader(), days)
+    except Exception as e:
+        logging.error("Get stats error: %s", e, exc_info=e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/cache/stats", dependencies=[Depends(require_admin)])
+async def cache_stats():
+    """Hit/miss/eviction counters for the document caches"""
+    return {
+        "users": user_cache.stats(),
+        "progress": progress_cache.stats(),
+        "write_behind": write_behind.stats(),
+        "single_flight": single_flight.stats(),
+        "batch_loader": {"users": user_loader.stats(), "progress": progress_loader.stats()},
+        "analytics": analytics_cache.stats(),
+        "events": event_log.stats(),
+        "read_pins": read_pins.stats()
+    }
+
+@api_router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def get_metrics():
+    """Request and MongoDB command metrics in Prometheus text format"""
+    return PlainTextResponse(
+        metrics.render(metrics.REGISTRY),
+        media_type="text/plain; version=0.0.4"
+    )
+
+@api_router.get("/health/ready")
+async def health_ready():
+    """Readiness probe: 503 until the pool is warm, and while MongoDB doesn't answer"""
+    if not ready:
+        raise HTTPException(status_code=503, detail="Servidor iniciando")
+    try:
+        started = time.perf_counter()
+        await asyncio.wait_for(client.admin.command("ping"), HEALTH_PING_TIMEOUT_SECONDS)
+        ping_ms = (time.perf_counter() - started) * 1000
+    except Exception as e:
+        logging.error("Health check error: %s", e, exc_info=e)
+        raise HTTPException(status_code=503, detail="Banco de dados indisponível")
+    
+    return {
+        "status": "ready",
+        "ping_ms": round(ping_ms, 2),
+        "pool": pool_monitor.stats(),
+        "max_pool_size": pool_options()["maxPoolSize"],
+        "cold_start_seconds": {
+            phase: metrics.cold_start_seconds.value((phase,)) for phase in ("ready", "first_request")
+        }
+    }
+
 @api_router.get("/")
 async def root():
     return {"message": "Protocolo 7D API v1.0"}
 
-# Include router
-app.include_router(api_router)
+# ==================== APP ====================
 
-# CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["https://app7d.netlify.app"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+# Set once startup has warmed the pool, cleared when shutdown begins
+ready = False
+HEALTH_PING_TIMEOUT_SECONDS = float(os.environ.get("HEALTH_PING_TIMEOUT_SECONDS", "1"))
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global ready, client
+    # Logging: JSON records are written by a listener thread, so a burst of
+    # errors never blocks the event loop on log I/O; repeats are sampled
+    log_listener = logs.setup_logging(
+        level=logging.getLevelName(os.environ.get("LOG_LEVEL", "INFO")),
+        sample_burst=int(os.environ.get("LOG_SAMPLE_BURST", "10")),
+        sample_window=float(os.environ.get("LOG_SAMPLE_WINDOW_SECONDS", "60")),
+        max_queue=int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+    )
+    if client is None:
+        connect()
+    
+    await ensure_indexes()
+    await warm_up()
+    write_behind.start()
+    event_log.start()
+    if os.environ.get("CHECK_QUERY_PLANS") == "1":
+        await check_query_plans()
+    cache_feed = None
+    if os.environ.get("CACHE_INVALIDATION_FEED") == "1":
+        cache_feed = asyncio.create_task(watch_cache_invalidations())
+    ready = True
+    metrics.cold_start_seconds.set(("ready",), time.perf_counter() - metrics.PROCESS_START)
+    
+    yield
+    
+    ready = False
+    if cache_feed:
+        cache_feed.cancel()
+    await write_behind.close()
+    await event_log.close()
+    # A closed client can't be reused; a new lifespan connects again
     client.close()
+    client = None
+    log_listener.stop()
+
+def create_app() -> FastAPI:
+    """The API app; MongoDB is connected by its lifespan unless connect() ran first"""
+    # Responses are rendered with orjson, including ObjectId
+    app = FastAPI(default_response_class=BSONResponse, lifespan=lifespan)
+    app.include_router(api_router)
+
+    app.add_middleware(PayloadLimitMiddleware, routes=PAYLOAD_LIMITS)
+    app.add_middleware(consistency.WriteMarkerMiddleware)
+    app.add_middleware(metrics.MetricsMiddleware)
+    app.add_middleware(logs.RequestContextMiddleware)
+
+    # CORS is added last so it wraps everything, and responses the other
+    # middleware answer themselves (413, 422) still carry its headers
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=["https://app7d.netlify.app"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["ETag", "X-Last-Write"],
+    )
+    return app
+
+app = create_app()
+logger = logging.getLogger(__name__)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Aggregate counters kept in the stats collection
+
+Routes increment three kinds of buckets as they write, so the totals can be
+read without scanning users or progress:
+
+    {"_id": "totals"}             users, onboarded, logins, pontos, dias_completados.dia_N
+    {"_id": "day:2026-01-31"}     new_users, onboarded, logins, pontos, dias_completados.dia_N
+    {"_id": "vicio:<vicio_alvo>"} users, pontos, dias_completados.dia_N
+
+Daily buckets record when something happened; vicio_alvo buckets follow a
+user who changes category. Increments go through the write-behind buffer,
+so the counters trail the routes by up to one flush and lose what a crashed
+worker still had pending. Everything except logins and the daily
+onboarded/pontos/dias_completados history can be recomputed from users and
+progress:
+
+    python stats.py rebuild --check    # report drift only
+    python stats.py rebuild            # overwrite the counters
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+TOTALS = "totals"
+
+
+def day_key(when: datetime) -> str:
+    return f"day:{when.date().isoformat()}"
+
+
+def vicio_key(vicio_alvo: str) -> str:
+    return f"vicio:{vicio_alvo}"
+
+
+Buckets = Dict[str, Dict[str, int]]
+
+
+def login_counters(now: datetime, is_new: bool) -> Buckets:
+    if not is_new:
+        return {TOTALS: {"logins": 1}, day_key(now): {"logins": 1}}
+    return {TOTALS: {"logins": 1, "users": 1}, day_key(now): {"logins": 1, "new_users": 1}}
+
+
+def onboarding_counters(
+    now: datetime,
+    previous: Optional[str],
+    vicio_alvo: str,
+    progress: Optional[Dict[str, Any]] = None
+) -> Buckets:
+    """Counters for a user choosing vicio_alvo, with previous the one they had"""
+    if previous == vicio_alvo:
+        return {}
+    if previous is None:
+        return {
+            TOTALS: {"onboarded": 1},
+            day_key(now): {"onboarded": 1},
+            vicio_key(vicio_alvo): {"users": 1},
+        }
+
+    # Move the user's points and days to the new category
+    moved = {"users": 1}
+    if progress:
+        moved["pontos"] = progress.get("pontos_totais", 0)
+        for dia in progress.get("dias_completados", []):
+            moved[f"dias_completados.dia_{dia}"] = 1
+    return {
+        vicio_key(previous): {field: -value for field, value in moved.items()},
+        vicio_key(vicio_alvo): moved,
+    }
+
+
+def complete_day_counters(now: datetime, vicio_alvo: Optional[str], dia: int, pontos: int) -> Buckets:
+    buckets = {TOTALS: {"pontos": pontos, f"dias_completados.dia_{dia}": 1}}
+    buckets[day_key(now)] = dict(buckets[TOTALS])
+    if vicio_alvo:
+        buckets[vicio_key(vicio_alvo)] = dict(buckets[TOTALS])
+    return buckets
+
+
+def merge_buckets(*all_buckets: Buckets) -> Buckets:
+    """One set of counters per bucket, summing counters that appear more than once"""
+    merged: Buckets = {}
+    for buckets in all_buckets:
+        for key, counters in buckets.items():
+            total = merged.setdefault(key, {})
+            for field, value in counters.items():
+                total[field] = total.get(field, 0) + value
+    return merged
+
+
+async def read_stats(db, days: int = 7, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Totals, the last days daily buckets and every vicio_alvo bucket"""
+    now = now or datetime.utcnow()
+    keys = [TOTALS] + [day_key(now - timedelta(days=n)) for n in range(days)]
+    docs = await db.stats.find({"$or": [
+        {"_id": {"$in": keys}},
+        {"_id": {"$regex": "^vicio:"}},
+    ]}).to_list(None)
+    by_key = {doc.pop("_id"): doc for doc in docs}
+
+    return {
+        "totals": by_key.get(TOTALS, {}),
+        "days": [
+            {"date": key[len("day:"):], **by_key.get(key, {})}
+            for key in keys[1:]
+        ],
+        "vicio_alvo": {
+            key[len("vicio:"):]: doc for key, doc in sorted(by_key.items()) if key.startswith("vicio:")
+        },
+    }
+
+
+# ==================== REBUILD ====================
+
+def _count_progress(counters: Dict[str, Any], progress: Dict[str, Any]):
+    counters["pontos"] += progress.get("pontos_totais", 0)
+    for dia in progress.get("dias_completados", []):
+        counters["dias_completados"][f"dia_{dia}"] += 1
+
+
+def _empty() -> Dict[str, Any]:
+    return {"users": 0, "pontos": 0, "dias_completados": defaultdict(int)}
+
+
+async def recompute(db) -> Dict[str, Dict[str, Any]]:
+    """Counters derivable from the current users and progress, by stats _id"""
+    totals = {**_empty(), "onboarded": 0}
+    by_vicio: Dict[str, Dict[str, Any]] = defaultdict(_empty)
+    new_users: Dict[str, int] = defaultdict(int)
+    vicio_by_email = {}
+
+    async for user in db.users.find({}, {"_id": 0, "email": 1, "vicio_alvo": 1, "created_at": 1}):
+        totals["users"] += 1
+        if user.get("created_at"):
+            new_users[day_key(user["created_at"])] += 1
+        if user.get("vicio_alvo") is not None:
+            totals["onboarded"] += 1
+            by_vicio[user["vicio_alvo"]]["users"] += 1
+            vicio_by_email[user["email"]] = user["vicio_alvo"]
+
+    async for progress in db.progress.find({}, {"_id": 0, "user_email": 1, "pontos_totais": 1, "dias_completados": 1}):
+        _count_progress(totals, progress)
+        if progress["user_email"] in vicio_by_email:
+            _count_progress(by_vicio[vicio_by_email[progress["user_email"]]], progress)
+
+    expected = {TOTALS: totals}
+    expected.update({vicio_key(vicio_alvo): counters for vicio_alvo, counters in by_vicio.items()})
+    expected.update({key: {"new_users": count} for key, count in new_users.items()})
+    for counters in expected.values():
+        if "dias_completados" in counters:
+            counters["dias_completados"] = dict(counters["dias_completados"])
+    return expected
+
+
+def _flatten(counters: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    flat = {}
+    for field, value in counters.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{field}."))
+        else:
+            flat[f"{prefix}{field}"] = value
+    return flat
+
+
+async def rebuild(db, check_only: bool = False) -> List[str]:
+    """Compare the counters with the live collections; fix them unless check_only
+
+    Returns one line per counter that had drifted.
+    """
+    expected = await recompute(db)
+    current = {doc.pop("_id"): doc async for doc in db.stats.find({})}
+    # vicio_alvo buckets nobody uses any more should be zero
+    for key in current:
+        if key.startswith("vicio:") and key not in expected:
+            expected[key] = {"users": 0, "pontos": 0}
+
+    drift = []
+    writes = []
+    for key, counters in sorted(expected.items()):
+        have = _flatten(current.get(key, {}))
+        want = _flatten(counters)
+        if not key.startswith("day:"):
+            # Days nobody has completed any more are absent from want
+            want.update({field: 0 for field in have if field.startswith("dias_completados.") and field not in want})
+        changed = {field: value for field, value in want.items() if have.get(field, 0) != value}
+        drift.extend(f"{key} {field}: {have.get(field, 0)} -> {value}" for field, value in changed.items())
+        if changed:
+            writes.append(UpdateOne({"_id": key}, {"$set": changed}, upsert=True))
+
+    if writes and not check_only:
+        await db.stats.bulk_write(writes, ordered=False)
+    return drift
+
+
+def main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / ".env")
+
+    parser = argparse.ArgumentParser(description="Maintain the stats collection")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--check", action="store_true", help="report drift without writing")
+    args = parser.parse_args()
+
+    async def run():
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        try:
+            return await rebuild(client[os.environ["DB_NAME"]], check_only=args.check)
+        finally:
+            client.close()
+
+    drift = asyncio.run(run())
+    for line in drift:
+        print(line)
+    if not drift:
+        print("Counters match the live totals")
+    elif args.check:
+        sys.exit(1)
+    else:
+        print(f"Fixed {len(drift)} counters")
+
+
+if __name__ == "__main__":
+    main()
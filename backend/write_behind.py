@@ -0,0 +1,90 @@
+import logging
+from typing import Any, Dict, List, Tuple
+
+from pymongo import UpdateOne
+
+from buffers import FlushBuffer, unapplied
+
+
+Update = Dict[str, Dict[str, Any]]
+
+
+class WriteBehindBuffer(FlushBuffer):
+    """Coalesces $set and $inc updates in memory and flushes them as unordered bulk writes
+
+    Only for low-value fields and counters: a pending update is lost if the
+    process dies before the next flush. Updates with an $inc are upserted,
+    so the first increment creates a counter document.
+
+    After a failed flush only the updates the server rejected are retried.
+    When it isn't known what the server applied, $set fields are retried,
+    being safe to apply twice, and $inc counters are dropped rather than
+    risk counting them twice.
+    """
+
+    def __init__(self, db, flush_interval: float = 5.0, max_batch: int = 500):
+        super().__init__(db, flush_interval, max_batch)
+        self._pending: Dict[Tuple[str, Tuple], Update] = {}
+        self.queued = 0
+        self.dropped = 0
+
+    def _update(self, collection: str, query: Dict[str, Any]) -> Update:
+        self.queued += 1
+        return self._pending.setdefault((collection, tuple(sorted(query.items()))), {})
+
+    def set(self, collection: str, query: Dict[str, Any], fields: Dict[str, Any]) -> None:
+        """Queue a $set, merging it with any pending update for the same document"""
+        self._update(collection, query).setdefault("$set", {}).update(fields)
+        self._added()
+
+    def inc(self, collection: str, query: Dict[str, Any], counters: Dict[str, int]) -> None:
+        """Queue an $inc, adding it to any pending update for the same document"""
+        pending = self._update(collection, query).setdefault("$inc", {})
+        for field, value in counters.items():
+            pending[field] = pending.get(field, 0) + value
+        self._added()
+
+    def _take(self) -> List[Tuple[Tuple[str, Tuple], Update]]:
+        pending, self._pending = self._pending, {}
+        return list(pending.items())
+
+    def _restore(self, items: List[Tuple[Tuple[str, Tuple], Update]]) -> None:
+        for key, update in items:
+            current = self._pending.setdefault(key, {})
+            # Fields set since the failed flush are newer and win; counts add up
+            if "$set" in update:
+                current["$set"] = {**update["$set"], **current.get("$set", {})}
+            for field, value in update.get("$inc", {}).items():
+                counters = current.setdefault("$inc", {})
+                counters[field] = counters.get(field, 0) + value
+
+    def _unwritten(self, batch, error):
+        retry = unapplied(batch, error)
+        if retry is not None:
+            return retry
+
+        retry = [(key, {"$set": update["$set"]}) for key, update in batch if "$set" in update]
+        dropped = sum(1 for _, update in batch if "$inc" in update)
+        if dropped:
+            self.dropped += dropped
+            logging.error("Write-behind dropped %s increments of unknown outcome", dropped)
+        return retry
+
+    def _batches(self, items):
+        by_collection: Dict[str, list] = {}
+        for item in items:
+            by_collection.setdefault(item[0][0], []).append(item)
+        batches = []
+        for writes in by_collection.values():
+            batches.extend(super()._batches(writes))
+        return batches
+
+    async def _write(self, batch) -> None:
+        collection = batch[0][0][0]
+        await self.db[collection].bulk_write(
+            [UpdateOne(dict(query), update, upsert="$inc" in update) for (_, query), update in batch],
+            ordered=False
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return {**super().stats(), "queued": self.queued, "dropped": self.dropped}
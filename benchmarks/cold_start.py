@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Cold start of the API with and without connection pool warm-up
+
+Starts `uvicorn server:app` against MONGO_URL, first with MONGO_MIN_POOL_SIZE=0
+(no warm-up) and then with --min-pool connections warmed up, and reports:
+
+- ready: seconds from spawning the process until it answers GET /api/
+- first: seconds until the first request that reads MongoDB succeeds
+- burst: latency of --burst concurrent MongoDB-backed requests sent right
+  after the server came up, as a deploy taking traffic would see them
+
+    python benchmarks/cold_start.py [--burst 50 --min-pool 20]
+"""
+
+import argparse
+import asyncio
+import os
+import secrets
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+
+async def wait_until_up(http, deadline):
+    while time.perf_counter() < deadline:
+        try:
+            if (await http.get("/api/")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.01)
+    raise SystemExit("Server did not come up in time")
+
+
+async def measure(args, min_pool):
+    import httpx
+
+    # /api/stats is an admin route
+    token = secrets.token_hex(16)
+    env = {**os.environ, "MONGO_MIN_POOL_SIZE": str(min_pool), "LOG_LEVEL": "WARNING", "ADMIN_TOKEN": token}
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(args.port)],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}") as http:
+            await wait_until_up(http, started + args.timeout)
+            ready = time.perf_counter() - started
+
+            async def timed():
+                sent = time.perf_counter()
+                response = await http.get("/api/stats", params={"days": 1}, headers={"X-Admin-Token": token})
+                return time.perf_counter() - sent, time.perf_counter() - started, response.status_code
+
+            results = await asyncio.gather(*[timed() for _ in range(args.burst)])
+    finally:
+        process.terminate()
+        process.wait()
+
+    latencies = sorted(latency for latency, _, status in results if status == 200)
+    first = min((at for _, at, status in results if status == 200), default=float("nan"))
+    return ready, first, latencies, sum(status != 200 for _, _, status in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start time with and without pool warm-up")
+    parser.add_argument("--burst", type=int, default=50)
+    parser.add_argument("--min-pool", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    print(f"{'warm-up':<10}{'ready s':>10}{'first s':>10}{'p50 ms':>10}{'max ms':>10}{'errors':>8}")
+    for name, min_pool in [("off", 0), (f"{args.min_pool} conns", args.min_pool)]:
+        ready, first, latencies, errors = asyncio.run(measure(args, min_pool))
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else float("nan")
+        worst = latencies[-1] * 1000 if latencies else float("nan")
+        print(f"{name:<10}{ready:>10.3f}{first:>10.3f}{p50:>10.2f}{worst:>10.2f}{errors:>8}")
+
+
+if __name__ == "__main__":
+    main()
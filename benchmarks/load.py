@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Load and latency benchmark for the Protocolo 7D API
+
+Runs the FastAPI app in-process through httpx's ASGI transport, against a
+local mongod (MONGO_URL) or an in-memory Motor stand-in (--in-memory, needs
+mongomock-motor; measures API overhead only). Drives a weighted mix of
+login / onboarding / complete-day / save-tool-data at a fixed concurrency and
+reports per-endpoint throughput and p50/p95/p99 latency.
+
+    python benchmarks/load.py --concurrency 50 --requests 5000
+    python benchmarks/load.py --save-baseline benchmarks/baseline.json
+    python benchmarks/load.py --baseline benchmarks/baseline.json --threshold 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+DEFAULT_MIX = "login=3,onboarding=1,complete_day=3,save_tool_data=3"
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, weight = part.split("=")
+        weights[name.strip()] = float(weight)
+    unknown = set(weights) - set(OPERATIONS)
+    if unknown:
+        raise SystemExit(f"Unknown operations in --mix: {', '.join(sorted(unknown))}")
+    return weights
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+# ==================== OPERATIONS ====================
+
+def tool_data_payload(dia):
+    return {f"campo_{n}": f"Resposta do dia {dia}, campo {n}. " * 6 for n in range(1, 5)}
+
+
+async def op_login(http, email):
+    return await http.post("/api/auth/login", json={"email": email})
+
+
+async def op_onboarding(http, email):
+    return await http.post("/api/auth/onboarding", json={"email": email, "vicio_alvo": "redes sociais"})
+
+
+async def op_complete_day(http, email):
+    return await http.post("/api/progress/complete-day", json={
+        "email": email, "dia": random.randint(1, 7), "pontos": 100
+    })
+
+
+async def op_save_tool_data(http, email):
+    dia = random.randint(1, 7)
+    return await http.post("/api/progress/save-tool-data", json={
+        "email": email, "dia": dia, "data": tool_data_payload(dia)
+    })
+
+
+OPERATIONS = {
+    "login": op_login,
+    "onboarding": op_onboarding,
+    "complete_day": op_complete_day,
+    "save_tool_data": op_save_tool_data,
+}
+
+
+# ==================== RUNNER ====================
+
+def load_server(in_memory):
+    """Import the app, pointing it at the in-memory stand-in if requested"""
+    os.environ.setdefault("DB_NAME", "benchmark_protocolo_7d")
+    # A few hundred simulated users would trip the per-email rate limits
+    for group in ("AUTH", "PROGRESS"):
+        os.environ.setdefault(f"ADMISSION_{group}_RATE", "1000000")
+        os.environ.setdefault(f"ADMISSION_{group}_BURST", "1000000")
+    if in_memory:
+        # mongomock has no time-series collections
+        os.environ.setdefault("EVENT_LOG_TIMESERIES", "0")
+    import server
+
+    if in_memory:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise SystemExit("--in-memory needs mongomock-motor (pip install mongomock-motor)")
+        server.connect(AsyncMongoMockClient())
+    else:
+        server.connect()
+    return server
+
+
+async def run(args):
+    import httpx
+
+    server = load_server(args.in_memory)
+    await server.client.drop_database(os.environ["DB_NAME"])
+    mix = parse_mix(args.mix)
+    names, weights = list(mix), list(mix.values())
+    emails = [f"bench-{uuid.uuid4().hex[:10]}@example.com" for _ in range(args.users)]
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+
+    # ASGITransport doesn't run the lifespan, so it is entered here
+    transport = httpx.ASGITransport(app=server.app)
+    async with server.lifespan(server.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as http:
+            # Every user exists before the measured phase, as in production
+            for start in range(0, len(emails), args.concurrency):
+                await asyncio.gather(*[op_login(http, email) for email in emails[start:start + args.concurrency]])
+
+            remaining = args.requests
+
+            async def worker():
+                nonlocal remaining
+                while remaining > 0:
+                    remaining -= 1
+                    name = random.choices(names, weights)[0]
+                    started = time.perf_counter()
+                    response = await OPERATIONS[name](http, random.choice(emails))
+                    latencies[name].append(time.perf_counter() - started)
+                    if response.status_code >= 400:
+                        errors[name] += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+            elapsed = time.perf_counter() - started
+
+    results = {}
+    for name in names:
+        values = sorted(latencies[name])
+        results[name] = {
+            "count": len(values),
+            "errors": errors[name],
+            "rps": len(values) / elapsed,
+            "p50": percentile(values, 0.50) * 1000,
+            "p95": percentile(values, 0.95) * 1000,
+            "p99": percentile(values, 0.99) * 1000,
+        }
+    return results, elapsed
+
+
+def report(results, elapsed):
+    total = sum(result["count"] for result in results.values())
+    print(f"{total} requests in {elapsed:.2f}s ({total / elapsed:.0f} req/s)\n")
+    print(f"{'endpoint':<16}{'count':>8}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<16}{result['count']:>8}{result['errors']:>8}{result['rps']:>10.0f}"
+            f"{result['p50']:>10.2f}{result['p95']:>10.2f}{result['p99']:>10.2f}"
+        )
+
+
+def regressions(results, baseline, threshold):
+    """Endpoints whose tail latency rose, or throughput fell, beyond threshold"""
+    found = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        for metric in ("p95", "p99"):
+            if result[metric] > reference[metric] * (1 + threshold):
+                found.append(f"{name} {metric}: {reference[metric]:.2f} ms -> {result[metric]:.2f} ms")
+        if result["rps"] < reference["rps"] * (1 - threshold):
+            found.append(f"{name} req/s: {reference['rps']:.0f} -> {result['rps']:.0f}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Protocolo 7D load benchmark")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000, help="measured requests in total")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"operation weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--in-memory", action="store_true", help="use mongomock-motor instead of MONGO_URL")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--baseline", type=Path, help="fail if results regress against this file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed regression (default: 0.2 = 20%%)")
+    parser.add_argument("--save-baseline", type=Path, help="write results to this file")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    # The app configures INFO logging, which would log every request httpx makes
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    results, elapsed = asyncio.run(run(args))
+    report(results, elapsed)
+
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\nBaseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        found = regressions(results, json.loads(args.baseline.read_text()), args.threshold)
+        if found:
+            print(f"\nRegressions beyond {args.threshold:.0%}:")
+            for line in found:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Event-loop stall under an error storm: the synchronous handler from
+logging.basicConfig against the queue pipeline in backend/logs.py.
+
+--tasks coroutines each log --errors errors, the way the route error paths
+do while MongoDB is down, and a heartbeat task measures how late its 1 ms
+sleeps wake up. Log output goes to a sink whose write() takes
+--write-latency seconds, like a stdout pipe with a slow reader.
+
+    python benchmarks/logging_storm.py [--tasks 200 --errors 50 --write-latency 0.0002]
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import logs
+
+HEARTBEAT = 0.001
+
+
+class SlowSink:
+    """Stream whose writes block like a congested pipe"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.lines = 0
+
+    def write(self, text):
+        time.sleep(self.latency)
+        self.lines += text.count("\n")
+
+    def flush(self):
+        pass
+
+
+def reset_root():
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+
+
+async def storm(tasks, errors, exc_info):
+    stalls = []
+    done = False
+
+    async def heartbeat():
+        while not done:
+            started = time.perf_counter()
+            await asyncio.sleep(HEARTBEAT)
+            stalls.append(max(0.0, time.perf_counter() - started - HEARTBEAT))
+
+    async def failing_requests():
+        for _ in range(errors):
+            try:
+                raise ConnectionError("localhost:27017: [Errno 111] Connection refused")
+            except ConnectionError as e:
+                logging.error("Login error: %s", e, exc_info=e if exc_info else None)
+            await asyncio.sleep(0)
+
+    beat = asyncio.create_task(heartbeat())
+    await asyncio.sleep(HEARTBEAT * 2)
+    started = time.perf_counter()
+    await asyncio.gather(*[failing_requests() for _ in range(tasks)])
+    elapsed = time.perf_counter() - started
+    done = True
+    await beat
+    return elapsed, sorted(stalls)
+
+
+def report(name, elapsed, stalls, sink):
+    p99 = stalls[min(len(stalls) - 1, int(len(stalls) * 0.99))] if stalls else 0.0
+    print(
+        f"{name:<10} storm {elapsed * 1000:8.1f} ms  "
+        f"stall max {max(stalls, default=0) * 1000:7.2f} ms  p99 {p99 * 1000:7.2f} ms  "
+        f"total {sum(stalls) * 1000:8.1f} ms  lines {sink.lines}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event-loop stall while logging an error storm")
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--errors", type=int, default=50, help="errors logged per task")
+    parser.add_argument("--write-latency", type=float, default=0.0002, help="seconds per sink write")
+    args = parser.parse_args()
+
+    sink = SlowSink(args.write_latency)
+    reset_root()
+    logging.basicConfig(level=logging.INFO, stream=sink, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    elapsed, stalls = asyncio.run(storm(args.tasks, args.errors, exc_info=False))
+    report("basic", elapsed, stalls, sink)
+
+    # Queue alone (every record written), then with the default sampling
+    for name, burst in [("queue", args.tasks * args.errors), ("sampled", 10)]:
+        sink = SlowSink(args.write_latency)
+        reset_root()
+        listener = logs.setup_logging(stream=sink, sample_burst=burst, max_queue=args.tasks * args.errors)
+        elapsed, stalls = asyncio.run(storm(args.tasks, args.errors, exc_info=True))
+        listener.stop()
+        report(name, elapsed, stalls, sink)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Serialization cost per response: FastAPI's default path (str(_id) +
+jsonable_encoder + JSONResponse) against BSONResponse, on progress documents
+shaped like production ones.
+
+    python benchmarks/serialization.py [--number 2000]
+"""
+
+import argparse
+import sys
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from responses import BSONResponse
+
+
+def progress_document():
+    """A finished 7-day progress document with every day's tool data embedded"""
+    now = datetime.utcnow()
+    return {
+        "_id": ObjectId(),
+        "user_email": "usuario@teste.com",
+        "dia_atual": 7,
+        "dias_completados": list(range(1, 8)),
+        "pontos_totais": 850,
+        "tempo_limpo_inicio": now - timedelta(days=7),
+        "medalhas": ["primeira_vitoria", "guerreiro_3_dias"],
+        "tool_data": {
+            f"dia_{dia}": {
+                f"campo_{n}": f"Resposta do dia {dia}, campo {n}. " * 8
+                for n in range(1, 6)
+            }
+            for dia in range(1, 8)
+        },
+        "tool_data_updated_at": {f"dia_{dia}": now - timedelta(days=7 - dia) for dia in range(1, 8)},
+        "updated_at": now,
+    }
+
+
+def tool_data_document():
+    """One day's tool data with a full history"""
+    now = datetime.utcnow()
+    data = {f"campo_{n}": f"Resposta, campo {n}. " * 8 for n in range(1, 6)}
+    return {
+        "user_email": "usuario@teste.com",
+        "dia": 1,
+        "data": data,
+        "version": 11,
+        "updated_at": now,
+        "history": [
+            {"version": version, "data": data, "updated_at": now - timedelta(hours=version)}
+            for version in range(1, 11)
+        ],
+    }
+
+
+def default_path(document):
+    document = dict(document)
+    document["_id"] = str(document.get("_id"))
+    return JSONResponse(jsonable_encoder(document)).body
+
+
+def bson_path(document):
+    return BSONResponse(document).body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    for name, document in [("progress", progress_document()), ("tool_data", tool_data_document())]:
+        size = len(bson_path(document))
+        before = min(timeit.repeat(lambda: default_path(document), number=args.number, repeat=5))
+        after = min(timeit.repeat(lambda: bson_path(document), number=args.number, repeat=5))
+        print(
+            f"{name:<10} {size:>6} bytes  "
+            f"default {before / args.number * 1e6:8.1f} µs  "
+            f"bson {after / args.number * 1e6:8.1f} µs  "
+            f"({before / after:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -70,10 +70,7 @@ export default function DashboardScreen() {
     }
 
     try {
-      const [user, progress] = await Promise.all([
-        userAPI.getUser(email),
-        userAPI.getProgress(email),
-      ]);
+      const { user, progress } = await userAPI.getSession(email);
 
       setUserData(user);
       setProgress(progress);
@@ -60,7 +60,7 @@ export default function DayScreen() {
   const router = useRouter();
   const { id } = useLocalSearchParams();
   const { email } = useAuthStore();
-  const { dias_completados, tool_data, completeDay } = useProgressStore();
+  const { dias_completados, completeDay } = useProgressStore();
   
   const dayId = String(id);
   const dayContent = DAY_CONTENT[dayId];
@@ -77,14 +77,17 @@ export default function DayScreen() {
   const loadDayData = async () => {
     setLoading(true);
     try {
-      const progress = await userAPI.getProgress(email!);
+      const [progress, toolData] = await Promise.all([
+        userAPI.getProgress(email!, { fields: 'dias_completados' }),
+        userAPI.getToolData(email!, parseInt(dayId)),
+      ]);
       
       // Check if day is completed
       setIsCompleted(progress.dias_completados.includes(parseInt(dayId)));
       
       // Load saved tool data
-      const savedData = progress.tool_data?.[`dia_${dayId}`];
-      if (savedData) {
+      const savedData = toolData.data;
+      if (savedData && Object.keys(savedData).length > 0) {
         setFormData(savedData);
       }
     } catch (error) {
@@ -11,6 +11,51 @@ const api = axios.create({
   },
 });
 
+// Server time of our last write, sent back so that whichever worker serves
+// the next read sends it to the primary and we see our own writes
+let lastWrite: string | undefined;
+
+api.interceptors.request.use((config) => {
+  if (lastWrite) {
+    config.headers['X-Last-Write'] = lastWrite;
+  }
+  return config;
+});
+
+api.interceptors.response.use((response) => {
+  lastWrite = response.headers?.['x-last-write'] ?? lastWrite;
+  return response;
+});
+
+// One key per logical write, sent again on every retry of that write, so a
+// retry whose first attempt went through is answered from the server's
+// stored response instead of being applied twice
+export const idempotencyKey = () =>
+  `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+
+const RETRIES = 2;
+const RETRY_DELAY_MS = 500;
+
+// Network errors, timeouts, 5xx, 409 (first attempt still running) and 429
+const isRetryable = (error: any) =>
+  !error.response || error.response.status >= 500 || [409, 429].includes(error.response.status);
+
+const postIdempotent = async (url: string, body: any, key: string = idempotencyKey()) => {
+  for (let attempt = 0; ; attempt++) {
+    try {
+      const response = await api.post(url, body, { headers: { 'Idempotency-Key': key } });
+      return response.data;
+    } catch (error: any) {
+      if (attempt >= RETRIES || !isRetryable(error)) {
+        throw error;
+      }
+      const retryAfter = Number(error.response?.headers?.['retry-after']);
+      const delay = retryAfter > 0 ? retryAfter * 1000 : RETRY_DELAY_MS * 2 ** attempt;
+      await new Promise((resolve) => setTimeout(resolve, delay));
+    }
+  }
+};
+
 export const authAPI = {
   login: async (email: string) => {
     const response = await api.post('/auth/login', { email });
@@ -18,8 +63,7 @@ export const authAPI = {
   },
   
   completeOnboarding: async (email: string, vicio_alvo: string) => {
-    const response = await api.post('/auth/onboarding', { email, vicio_alvo });
-    return response.data;
+    return postIdempotent('/auth/onboarding', { email, vicio_alvo });
   },
 };
 
@@ -29,21 +73,43 @@ export const userAPI = {
     return response.data;
   },
   
-  getProgress: async (email: string) => {
-    const response = await api.get(`/progress/${email}`);
+  getProgress: async (email: string, params?: { fields?: string; since?: string }) => {
+    const response = await api.get(`/progress/${email}`, { params });
+    return response.data;
+  },
+  
+  getSession: async (email: string) => {
+    const response = await api.get(`/session/${email}`);
+    return response.data;
+  },
+  
+  getToolData: async (email: string, dia: number) => {
+    const response = await api.get(`/tool-data/${email}/${dia}`);
     return response.data;
   },
 };
 
 export const progressAPI = {
   completeDay: async (email: string, dia: number, pontos: number) => {
-    const response = await api.post('/progress/complete-day', { email, dia, pontos });
-    return response.data;
+    return postIdempotent('/progress/complete-day', { email, dia, pontos });
   },
   
   saveToolData: async (email: string, dia: number, data: any) => {
-    const response = await api.post('/progress/save-tool-data', { email, dia, data });
-    return response.data;
+    return postIdempotent('/progress/save-tool-data', { email, dia, data });
+  },
+};
+
+export type SyncOperation =
+  | { type: 'complete_day'; dia: number; pontos: number }
+  | { type: 'save_tool_data'; dia: number; data: any };
+
+// The server applies every complete_day before any save_tool_data, one
+// round trip per completion, and answers with results in queue order
+export const syncAPI = {
+  // A queue that persists operations should persist the key with them and
+  // pass it again when it resends the same batch
+  batch: async (email: string, operations: SyncOperation[], key?: string) => {
+    return postIdempotent('/sync/batch', { email, operations }, key);
   },
 };
 
@@ -6,7 +6,6 @@ interface ProgressState {
   pontos_totais: number;
   tempo_limpo_inicio: string | null;
   medalhas: string[];
-  tool_data: Record<string, any>;
   setProgress: (progress: Partial<ProgressState>) => void;
   completeDay: (dia: number) => void;
   reset: () => void;
@@ -18,7 +17,6 @@ export const useProgressStore = create<ProgressState>((set) => ({
   pontos_totais: 0,
   tempo_limpo_inicio: null,
   medalhas: [],
-  tool_data: {},
   
   setProgress: (progress) => set((state) => ({ ...state, ...progress })),
   
@@ -33,6 +31,5 @@ export const useProgressStore = create<ProgressState>((set) => ({
     pontos_totais: 0,
     tempo_limpo_inicio: null,
     medalhas: [],
-    tool_data: {},
   }),
 }));
@@ -0,0 +1,84 @@
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+load_dotenv(BACKEND_DIR / ".env")
+
+
+@pytest.fixture(scope="session")
+def loop():
+    """One event loop for the whole session, since the Motor client binds to it"""
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def server(loop):
+    """The backend module, skipping the test when MongoDB is not reachable"""
+    try:
+        MongoClient(os.environ["MONGO_URL"], serverSelectionTimeoutMS=1000).admin.command("ping")
+    except Exception as e:
+        pytest.skip(f"MongoDB not reachable: {e}")
+
+    import server
+
+    if server.client is None:
+        server.connect()
+    loop.run_until_complete(server.ensure_indexes())
+    return server
+
+
+@pytest.fixture
+def email():
+    return f"test-{uuid.uuid4().hex[:12]}@example.com"
+
+
+class FakeCollection:
+    """Stands in for a collection written by a buffer, recording what reaches it
+
+    Errors queued in errors are raised by the next calls, one per call. The
+    writes a BulkWriteError doesn't list are applied, as the server would.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.errors = []
+        self.writes = []
+
+    async def _call(self, writes):
+        await asyncio.sleep(self.delay)
+        error = self.errors.pop(0) if self.errors else None
+        if error is None or isinstance(error, BulkWriteError):
+            failed = {write_error["index"] for write_error in error.details["writeErrors"]} if error else set()
+            self.writes.extend(write for index, write in enumerate(writes) if index not in failed)
+        if error:
+            raise error
+
+    @staticmethod
+    def rejecting(*indices: int) -> BulkWriteError:
+        """The error of an unordered bulk write whose writes at indices failed"""
+        return BulkWriteError({
+            "writeErrors": [{"index": index, "code": 121, "errmsg": "Document failed validation"} for index in indices],
+            "writeConcernErrors": [],
+        })
+
+    async def insert_many(self, documents, ordered=True):
+        await self._call(documents)
+
+    async def bulk_write(self, requests, ordered=True):
+        await self._call(requests)
+
+
+@pytest.fixture
+def fake_collection():
+    return FakeCollection
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from admission import AdmissionController, TokenBuckets, _request_email
+
+
+def _request(email):
+    return Request({"type": "http", "method": "GET", "path_params": {"email": email}, "headers": []})
+
+
+def test_token_bucket_limits_per_key():
+    buckets = TokenBuckets(rate=1, burst=2)
+
+    assert buckets.take("a") == 0
+    assert buckets.take("a") == 0
+    assert buckets.take("a") > 0
+    assert buckets.take("b") == 0
+
+
+def test_rate_limited_email_gets_429():
+    controller = AdmissionController({"progress": TokenBuckets(rate=0.5, burst=1)}, max_in_flight=4, queue_timeout=0.1)
+    admit = controller.limit("progress")
+
+    async def scenario():
+        async for _ in admit(_request("a@example.com")):
+            pass
+        with pytest.raises(HTTPException) as error:
+            async for _ in admit(_request("a@example.com")):
+                pass
+        return error.value
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 429
+    assert error.headers["Retry-After"] == "2"
+
+
+def test_overload_sheds_with_503():
+    controller = AdmissionController({"progress": TokenBuckets(rate=100, burst=100)}, max_in_flight=1, queue_timeout=0.01)
+    admit = controller.limit("progress")
+
+    async def scenario():
+        holder = admit(_request("a@example.com"))
+        await holder.__anext__()
+        with pytest.raises(HTTPException) as error:
+            async for _ in admit(_request("b@example.com")):
+                pass
+        await holder.aclose()
+        return error.value
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert "Retry-After" in error.headers
+
+
+@pytest.mark.parametrize("body, email", [
+    (b'{"email": "a@example.com", "dia": 1, "data": {"email": "b@example.com"}}', "a@example.com"),
+    (b'{"dia": 1, "data": {"email": "b@example.com"}, "email": "a@example.com"}', "a@example.com"),
+    (b'{"dia": 1, "email":"a\\u0040example.com"}', "a@example.com"),
+    (b'{"\\u0065mail": "a@example.com"}', "a@example.com"),
+    (b'{"dia": 1}', None),
+    (b"not json", None),
+])
+def test_request_email_from_body(body, email):
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    request = Request({"type": "http", "method": "POST", "path_params": {}, "headers": []}, receive)
+
+    assert asyncio.run(_request_email(request)) == email
@@ -0,0 +1,66 @@
+from datetime import datetime
+
+import pandas as pd
+
+import analytics
+
+
+def _frame():
+    return pd.DataFrame({
+        "email": ["a@example.com", "b@example.com", "c@example.com", "d@example.com"],
+        "vicio_alvo": ["redes sociais", "redes sociais", "jogos", None],
+        "created_at": [datetime(2026, 1, 5), datetime(2026, 1, 6), datetime(2026, 1, 13), datetime(2026, 1, 14)],
+        "dias_completados": [[1, 2, 3], [1, 3], [2], None],
+        "pontos_totais": [300, 200, 100, None],
+        "tempo_limpo_inicio": [datetime(2026, 1, 5), datetime(2026, 1, 9), None, None],
+        "medalhas": [["primeira_vitoria", "guerreiro_3_dias"], ["primeira_vitoria"], [], None],
+    })
+
+
+def test_funnel_counts_completed_and_consecutive_days():
+    report = analytics.summarize(_frame(), now=datetime(2026, 1, 15))
+
+    assert [day["completed"] for day in report["funnel"][:4]] == [2, 2, 2, 0]
+    assert [day["reached"] for day in report["funnel"][:4]] == [2, 1, 1, 0]
+    assert report["funnel"][0]["rate"] == 0.5
+    assert report["users"] == 4
+    assert report["onboarded"] == 3
+
+
+def test_retention_groups_by_signup_week():
+    report = analytics.summarize(_frame(), cohort="week", now=datetime(2026, 1, 15))
+
+    assert [(row["cohort"], row["users"]) for row in report["retention"]] == [("2026-01-05", 2), ("2026-01-12", 2)]
+    assert report["retention"][0]["retention"][:3] == [1.0, 0.5, 1.0]
+    assert report["retention"][1]["retention"][:3] == [0.0, 0.5, 0.0]
+
+
+def test_points_and_medals():
+    report = analytics.summarize(_frame(), now=datetime(2026, 1, 15))
+
+    assert report["points"]["quantiles"]["p50"] == 150
+    assert sum(bucket["users"] for bucket in report["points"]["histogram"]) == 4
+    assert report["points"]["by_vicio_alvo"]["redes sociais"] == {"users": 2, "mean": 250.0, "median": 250.0, "total": 500}
+    assert report["medalhas"] == {"primeira_vitoria": 2, "guerreiro_3_dias": 1}
+    assert report["tempo_limpo_dias"]["median"] == 8.0
+
+
+def test_empty_frame():
+    frame = pd.DataFrame(columns=["email", *analytics.USER_COLUMNS[1:], *analytics.PROGRESS_COLUMNS])
+
+    report = analytics.summarize(frame)
+
+    assert report["users"] == 0
+    assert report["funnel"][0] == {"dia": 1, "completed": 0, "reached": 0, "rate": 0.0}
+    assert report["retention"] == []
+
+
+def test_analytics_route_is_cached(loop, server, email):
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+    server.analytics_cache.clear()
+
+    first = loop.run_until_complete(server.get_analytics("week"))
+    second = loop.run_until_complete(server.get_analytics("week"))
+
+    assert first["users"] >= 1
+    assert second is first
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from buffers import FlushBuffer
+
+
+class ListBuffer(FlushBuffer):
+    """Inserts items into db["items"]"""
+
+    def __init__(self, db, flush_interval: float = 1.0, max_batch: int = 100):
+        super().__init__(db, flush_interval, max_batch)
+        self._pending = []
+
+    def add(self, item):
+        self._pending.append(item)
+        self._added()
+
+    def _take(self):
+        pending, self._pending = self._pending, []
+        return pending
+
+    def _restore(self, items):
+        self._pending[:0] = items
+
+    async def _write(self, batch):
+        await self.db["items"].insert_many(batch)
+
+    def _unwritten(self, batch, error):
+        return batch
+
+
+def test_subclasses_must_define_writes():
+    class Incomplete(FlushBuffer):
+        def _take(self):
+            return []
+
+    with pytest.raises(TypeError):
+        Incomplete({}, 1.0, 100)
+
+
+def test_flushes_early_at_max_batch(fake_collection):
+    items = fake_collection()
+    buffer = ListBuffer({"items": items}, flush_interval=60, max_batch=2)
+
+    async def scenario():
+        buffer.add(1)
+        buffer.add(2)
+        await asyncio.sleep(0)
+        await buffer.close()
+
+    asyncio.run(scenario())
+
+    assert items.writes == [1, 2]
+    assert buffer.stats() == {"pending": 0, "flushed": 2}
+
+
+def test_close_waits_for_running_flush(fake_collection):
+    items = fake_collection(delay=0.05)
+    buffer = ListBuffer({"items": items}, flush_interval=0.01)
+
+    async def scenario():
+        buffer.start()
+        buffer.add(1)
+        await asyncio.sleep(0.03)  # periodic flush is inside insert_many
+        await buffer.close()
+
+    asyncio.run(scenario())
+
+    assert items.writes == [1]
+    assert buffer.stats() == {"pending": 0, "flushed": 1}
+
+
+def test_failed_batch_goes_back_with_later_ones(fake_collection):
+    items = fake_collection()
+    items.errors.append(ConnectionError("down"))
+    buffer = ListBuffer({"items": items}, max_batch=2)
+    buffer._pending.extend([0, 1, 2])
+
+    asyncio.run(buffer.flush())
+    assert buffer.stats() == {"pending": 3, "flushed": 0}
+    buffer._pending.append(3)
+    asyncio.run(buffer.flush())
+
+    assert items.writes == [0, 1, 2, 3]
+    assert buffer.stats() == {"pending": 0, "flushed": 4}
@@ -0,0 +1,172 @@
+import asyncio
+import uuid
+
+from fastapi import Response
+
+from cache import BatchLoader, DocumentCache, SingleFlight
+
+
+def test_lru_eviction():
+    cache = DocumentCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry():
+    cache = DocumentCache(max_size=10, ttl=-1)
+    cache.set("a", 1)
+
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_progress_cache_invalidated_by_writes(server, loop, email):
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+    before = loop.run_until_complete(server.get_progress(email, Response()))
+    assert loop.run_until_complete(server.get_progress(email, Response())) is before
+
+    loop.run_until_complete(server.complete_day(server.CompleteDayRequest(email=email, dia=1, pontos=50)))
+
+    after = loop.run_until_complete(server.get_progress(email, Response()))
+    assert after["dias_completados"] == [1]
+
+
+def test_single_flight_shares_concurrent_calls():
+    flight = SingleFlight()
+    calls = []
+
+    async def query(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return {"key": key}
+
+    async def scenario():
+        return await asyncio.gather(*[flight.do("a", query, "a") for _ in range(5)], flight.do("b", query, "b"))
+
+    results = asyncio.run(scenario())
+
+    assert calls == ["a", "b"]
+    assert results[0] is results[4]
+    assert flight.stats() == {"in_flight": 0, "calls": 2, "shared": 4}
+
+
+def test_single_flight_shares_errors():
+    flight = SingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("mongo down")
+
+    async def scenario():
+        return await asyncio.gather(*[flight.do("a", failing) for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_invalidation_detaches_in_flight_read():
+    cache = DocumentCache()
+    flight = SingleFlight()
+    calls = []
+
+    async def query():
+        calls.append(None)
+        await asyncio.sleep(0.01)
+        return {"version": len(calls)}
+
+    async def scenario():
+        generation = cache.generation
+        first = asyncio.ensure_future(flight.do("a", query))
+        await asyncio.sleep(0)
+        # A write lands while the first read is in flight
+        cache.invalidate("a")
+        flight.forget("a")
+        second = await flight.do("a", query)
+        cache.set("a", await first, generation)
+        return second
+
+    second = asyncio.run(scenario())
+
+    assert len(calls) == 2
+    assert second == {"version": 2}
+    assert cache.get("a") is None
+
+
+def test_invalidating_other_keys_does_not_block_set():
+    cache = DocumentCache(max_size=2)
+    generation = cache.generation
+
+    cache.invalidate("b")
+    cache.set("a", 1, generation)
+    assert cache.get("a") == 1
+
+    cache.invalidate("a")
+    cache.set("a", 2, generation)
+    assert cache.get("a") is None
+
+    # Once a's invalidation is forgotten, reads older than it still can't store
+    cache.invalidate("c")
+    cache.invalidate("d")
+    cache.set("a", 3, generation)
+    assert cache.get("a") is None
+
+
+def test_batch_loader_fetches_concurrent_keys_together():
+    batches = []
+
+    async def fetch(keys):
+        batches.append(sorted(keys))
+        return {key: {"key": key} for key in keys if key != "missing"}
+
+    loader = BatchLoader(fetch, window=0.001)
+
+    async def scenario():
+        return await asyncio.gather(*[loader.load(key) for key in ["a", "b", "a", "missing"]])
+
+    results = asyncio.run(scenario())
+
+    assert batches == [["a", "b", "missing"]]
+    assert results == [{"key": "a"}, {"key": "b"}, {"key": "a"}, None]
+    assert loader.stats() == {"pending": 0, "loads": 4, "batches": 1}
+
+
+def test_batch_loader_splits_at_max_batch_and_shares_errors():
+    batches = []
+
+    async def fetch(keys):
+        batches.append(len(keys))
+        raise RuntimeError("down")
+
+    loader = BatchLoader(fetch, window=0, max_batch=2)
+
+    async def scenario():
+        return await asyncio.gather(*[loader.load(key) for key in "abc"], return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    assert batches == [2, 1]
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_concurrent_user_lookups_share_one_query(server, loop):
+    emails = [f"batch-{n}-{uuid.uuid4().hex[:8]}@example.com" for n in range(5)]
+    for email in emails:
+        loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+        server.invalidate_user(email)
+    batches = server.user_loader.batches
+
+    async def lookups():
+        return await asyncio.gather(*[server.get_user(email) for email in emails])
+
+    users = loop.run_until_complete(lookups())
+
+    assert [user["email"] for user in users] == emails
+    assert server.user_loader.batches == batches + 1
@@ -0,0 +1,45 @@
+import asyncio
+
+
+def _complete(server, email, dia, pontos=50):
+    return server.complete_day(server.CompleteDayRequest(email=email, dia=dia, pontos=pontos))
+
+
+def test_complete_day_awards_medals(server, loop, email):
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+
+    day1 = loop.run_until_complete(_complete(server, email, 1))
+    assert day1["novas_medalhas"] == ["primeira_vitoria"]
+    day2 = loop.run_until_complete(_complete(server, email, 2))
+    assert day2["novas_medalhas"] == []
+    day3 = loop.run_until_complete(_complete(server, email, 3))
+    assert day3["novas_medalhas"] == ["guerreiro_3_dias"]
+
+    progress = loop.run_until_complete(server.db.progress.find_one({"user_email": email}))
+    assert progress["dias_completados"] == [1, 2, 3]
+    assert progress["medalhas"] == ["primeira_vitoria", "guerreiro_3_dias"]
+    assert progress["pontos_totais"] == 150
+    assert progress["dia_atual"] == 4
+
+
+def test_duplicate_submissions_count_once(server, loop, email):
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+
+    async def retries(n):
+        return await asyncio.gather(*[_complete(server, email, 1) for _ in range(n)])
+
+    results = loop.run_until_complete(retries(10))
+
+    assert sum(not r["already_completed"] for r in results) == 1
+    progress = loop.run_until_complete(server.db.progress.find_one({"user_email": email}))
+    assert progress["pontos_totais"] == 50
+    assert progress["dias_completados"] == [1]
+
+
+def test_complete_day_unknown_user(server, loop, email):
+    try:
+        loop.run_until_complete(_complete(server, email, 1))
+    except server.HTTPException as e:
+        assert e.status_code == 404
+    else:
+        raise AssertionError("expected 404")
@@ -0,0 +1,52 @@
+import time
+from datetime import datetime
+
+from fastapi import Response
+
+
+def test_progress_etag_revalidation(server, loop, email):
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+
+    response = Response()
+    loop.run_until_complete(server.get_progress(email, response))
+    etag = response.headers["ETag"]
+
+    not_modified = loop.run_until_complete(server.get_progress(email, Response(), if_none_match=etag))
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+
+    time.sleep(0.01)  # updated_at has millisecond precision
+    loop.run_until_complete(server.complete_day(server.CompleteDayRequest(email=email, dia=1, pontos=50)))
+
+    response = Response()
+    progress = loop.run_until_complete(server.get_progress(email, response, if_none_match=etag))
+    assert progress["dias_completados"] == [1]
+    assert response.headers["ETag"] != etag
+
+
+def test_etag_differs_per_representation(server, loop, email):
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+
+    tags = set()
+    for kwargs in [{}, {"fields": "pontos_totais"}, {"fields": "medalhas"}, {"since": datetime(2026, 1, 1)}]:
+        response = Response()
+        loop.run_until_complete(server.get_progress(email, response, **kwargs))
+        tags.add(response.headers["ETag"])
+        assert response.headers["Vary"] == "Accept-Encoding"
+    assert len(tags) == 4
+
+    response = Response()
+    loop.run_until_complete(server.get_progress(email, response, fields="pontos_totais"))
+    etag = response.headers["ETag"]
+    assert loop.run_until_complete(server.get_progress(email, Response(), fields="pontos_totais", if_none_match=etag)).status_code == 304
+    full = loop.run_until_complete(server.get_progress(email, Response(), if_none_match=etag))
+    assert not isinstance(full, Response)
+
+
+def test_if_none_match_list_and_wildcard(server):
+    etag = '"2026-01-01T00:00:00"'
+
+    assert server.etag_matches(etag, f'"other", W/{etag}')
+    assert server.etag_matches(etag, "*")
+    assert not server.etag_matches(etag, '"2026-01-01T00:00:00-abc"')
+    assert not server.etag_matches(etag, '"other"')
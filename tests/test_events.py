@@ -0,0 +1,98 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+from events import EventLog
+
+
+def test_flush_writes_events_and_hourly_counters(server, loop, email):
+    event_type = f"test-{uuid.uuid4().hex[:8]}"
+    log = EventLog(server.db)
+
+    log.emit(email, event_type, dia=1, pontos=50, ts=datetime(2026, 1, 31, 10, 5))
+    log.emit(email, event_type, dia=2, pontos=70, ts=datetime(2026, 1, 31, 10, 40))
+    log.emit(email, event_type, dia=3, pontos=30, ts=datetime(2026, 1, 31, 11, 0))
+    assert log.stats()["pending"] == 3
+
+    loop.run_until_complete(log.close())
+
+    events = loop.run_until_complete(server.db.events.find({"meta.user": email}).to_list(None))
+    assert sorted(event["dia"] for event in events) == [1, 2, 3]
+    hours = loop.run_until_complete(server.db.event_hours.find({"type": event_type}, {"_id": 0}).sort("hour", 1).to_list(None))
+    assert hours == [
+        {"hour": datetime(2026, 1, 31, 10), "type": event_type, "count": 2, "pontos": 120},
+        {"hour": datetime(2026, 1, 31, 11), "type": event_type, "count": 1, "pontos": 30},
+    ]
+    assert log.stats() == {"pending": 0, "emitted": 3, "dropped": 0, "flushed": 3, "pending_hours": 0}
+
+
+def test_emit_drops_past_max_pending(server):
+    log = EventLog(server.db, max_pending=2)
+
+    for dia in range(1, 4):
+        log.emit("a@example.com", "complete_day", dia=dia)
+
+    assert log.stats()["pending"] == 2
+    assert log.stats()["dropped"] == 1
+
+
+def test_routes_emit_events(server, loop, email):
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+    loop.run_until_complete(server.complete_day(server.CompleteDayRequest(email=email, dia=1, pontos=50)))
+    loop.run_until_complete(server.save_tool_data(server.SaveToolDataRequest(email=email, dia=1, data={"nota": "ok"})))
+    loop.run_until_complete(server.event_log.flush())
+
+    events = loop.run_until_complete(server.get_events(email))["events"]
+
+    assert [(event["type"], event.get("dia"), event.get("pontos")) for event in events] == [
+        ("signup", None, None),
+        ("complete_day", 1, 50),
+        ("save_tool_data", 1, None),
+    ]
+
+
+def _hours(writes):
+    return [(write._filter["hour"].hour, write._doc["$inc"]) for write in writes]
+
+
+def test_failed_hourly_counters_retry_without_reinserting(fake_collection):
+    db = {"events": fake_collection(), "event_hours": fake_collection()}
+    db["event_hours"].errors.append(fake_collection.rejecting(0))
+    log = EventLog(db)
+    log.emit("a@example.com", "login", ts=datetime(2026, 1, 31, 10, 5))
+    log.emit("a@example.com", "login", ts=datetime(2026, 1, 31, 11, 5))
+
+    asyncio.run(log.flush())
+    assert log.stats()["pending_hours"] == 1
+    asyncio.run(log.flush())
+
+    assert len(db["events"].writes) == 2
+    assert _hours(db["event_hours"].writes) == [(11, {"count": 1, "pontos": 0}), (10, {"count": 1, "pontos": 0})]
+
+
+def test_rejected_events_retry_alone(fake_collection):
+    db = {"events": fake_collection(), "event_hours": fake_collection()}
+    db["events"].errors.append(fake_collection.rejecting(1))
+    log = EventLog(db)
+    for dia in range(1, 4):
+        log.emit("a@example.com", "complete_day", dia=dia, pontos=10, ts=datetime(2026, 1, 31, 10, dia))
+
+    asyncio.run(log.flush())
+    asyncio.run(log.flush())
+
+    assert [event["dia"] for event in db["events"].writes] == [1, 3, 2]
+    assert _hours(db["event_hours"].writes) == [(10, {"count": 2, "pontos": 20}), (10, {"count": 1, "pontos": 10})]
+
+
+def test_events_of_unknown_outcome_are_dropped(fake_collection):
+    db = {"events": fake_collection(), "event_hours": fake_collection()}
+    db["events"].errors.append(ConnectionError("reset"))
+    log = EventLog(db)
+    log.emit("a@example.com", "login")
+
+    asyncio.run(log.flush())
+    asyncio.run(log.flush())
+
+    assert db["events"].writes == []
+    assert log.stats()["pending"] == 0
+    assert log.stats()["dropped"] == 1
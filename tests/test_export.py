@@ -0,0 +1,75 @@
+import csv
+import io
+import uuid
+from datetime import datetime
+
+import orjson
+import pytest
+from fastapi import HTTPException
+
+import export
+
+
+def test_export_query_filters():
+    after = "65f0c0ffee0123456789abcd"
+    query = export.export_query(datetime(2026, 1, 1), datetime(2026, 2, 1), "redes sociais", after)
+
+    assert query == {
+        "_id": {"$gt": export.ObjectId(after)},
+        "created_at": {"$gte": datetime(2026, 1, 1), "$lt": datetime(2026, 2, 1)},
+        "vicio_alvo": "redes sociais",
+    }
+    with pytest.raises(ValueError):
+        export.export_query(after="not-an-id")
+
+
+def test_encode_csv_flattens_lists_and_dates():
+    row = dict.fromkeys(export.COLUMNS)
+    row.update(_id="abc", email="a@example.com", dias_completados=[1, 2], created_at=datetime(2026, 1, 2, 3, 4))
+
+    lines = list(csv.reader(io.StringIO(export.encode_csv([row], header=True).decode())))
+
+    assert lines[0] == export.COLUMNS
+    assert lines[1][:7] == ["abc", "a@example.com", "", "2026-01-02T03:04:00", "", "", "1;2"]
+
+
+def _collect(loop, response):
+    async def read():
+        return b"".join([chunk async for chunk in response.body_iterator])
+
+    return loop.run_until_complete(read())
+
+
+def test_export_joins_progress_and_resumes(loop, server):
+    vicio_alvo = f"export-{uuid.uuid4().hex[:8]}"
+    emails = [f"export-{uuid.uuid4().hex[:12]}@example.com" for _ in range(3)]
+    for email in emails:
+        loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+        loop.run_until_complete(server.complete_onboarding(server.OnboardingRequest(email=email, vicio_alvo=vicio_alvo)))
+    loop.run_until_complete(server.complete_day(server.CompleteDayRequest(email=emails[0], dia=1, pontos=50)))
+
+    body = _collect(loop, loop.run_until_complete(server.export_users(vicio_alvo=vicio_alvo, limit=2)))
+    first = [orjson.loads(line) for line in body.splitlines()]
+
+    assert [row["email"] for row in first] == emails[:2]
+    assert first[0]["dias_completados"] == [1]
+    assert first[0]["pontos_totais"] == 50
+
+    body = _collect(loop, loop.run_until_complete(server.export_users(vicio_alvo=vicio_alvo, after=first[-1]["_id"])))
+    assert [orjson.loads(line)["email"] for line in body.splitlines()] == emails[2:]
+
+    body = _collect(loop, loop.run_until_complete(server.export_users(format="csv", vicio_alvo=vicio_alvo)))
+    assert len(body.decode().splitlines()) == 4
+
+    body = _collect(loop, loop.run_until_complete(server.export_users(format="csv", vicio_alvo=vicio_alvo, after=first[-1]["_id"])))
+    assert [line.split(",")[1] for line in body.decode().splitlines()] == emails[2:]
+
+
+def test_export_requires_admin_token(loop, server, monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "segredo")
+
+    with pytest.raises(HTTPException) as error:
+        loop.run_until_complete(server.require_admin("errado"))
+    assert error.value.status_code == 403
+
+    loop.run_until_complete(server.require_admin("segredo"))
@@ -0,0 +1,35 @@
+import pytest
+from fastapi import HTTPException
+
+
+def test_not_ready_until_started(server, loop, monkeypatch):
+    monkeypatch.setattr(server, "ready", False)
+
+    with pytest.raises(HTTPException) as error:
+        loop.run_until_complete(server.health_ready())
+    assert error.value.status_code == 503
+
+
+def test_ready_reports_ping_and_pool(server, loop, monkeypatch):
+    monkeypatch.setattr(server, "ready", True)
+
+    health = loop.run_until_complete(server.health_ready())
+
+    assert health["status"] == "ready"
+    assert health["ping_ms"] >= 0
+    assert isinstance(health["pool"], dict)
+    assert set(health["cold_start_seconds"]) == {"ready", "first_request"}
+
+
+def test_pool_options_from_environment(server, monkeypatch):
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "50")
+    monkeypatch.setenv("MONGO_MIN_POOL_SIZE", "5")
+    monkeypatch.setenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000")
+    monkeypatch.setenv("MONGO_COMPRESSORS", "zlib")
+
+    assert server.pool_options() == {
+        "maxPoolSize": 50,
+        "minPoolSize": 5,
+        "waitQueueTimeoutMS": 2000,
+        "compressors": "zlib",
+    }
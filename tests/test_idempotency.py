@@ -0,0 +1,80 @@
+import pytest
+
+
+def _save(server, email, data, key):
+    request = server.SaveToolDataRequest(email=email, dia=1, data=data)
+    return server.save_tool_data(request, idempotency_key=key)
+
+
+def test_replay_returns_stored_response(server, loop, email):
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+    key = f"key-{email}"
+
+    first = loop.run_until_complete(_save(server, email, {"n": 1}, key))
+    replay = loop.run_until_complete(_save(server, email, {"n": 1}, key))
+
+    assert replay == first
+    tool_data = loop.run_until_complete(server.get_tool_data(email, 1))
+    assert tool_data["version"] == 1
+    assert tool_data["data"] == {"n": 1}
+
+
+def test_key_reused_with_another_body_is_refused(server, loop, email):
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+    key = f"key-{email}"
+    loop.run_until_complete(_save(server, email, {"n": 1}, key))
+
+    with pytest.raises(server.HTTPException) as error:
+        loop.run_until_complete(_save(server, email, {"n": 2}, key))
+    assert error.value.status_code == 422
+
+
+def test_keys_are_scoped_to_the_user(server, loop, email):
+    other = f"other-{email}"
+    for user in [email, other]:
+        loop.run_until_complete(server.login(server.LoginRequest(email=user)))
+
+    loop.run_until_complete(_save(server, email, {"n": 1}, "shared-key"))
+    loop.run_until_complete(_save(server, other, {"n": 1}, "shared-key"))
+
+    tool_data = loop.run_until_complete(server.get_tool_data(other, 1))
+    assert tool_data["data"] == {"n": 1}
+
+
+def test_failed_request_releases_key(server, loop, email):
+    key = f"key-{email}"
+    try:
+        loop.run_until_complete(_save(server, email, {"n": 1}, key))
+    except server.HTTPException as e:
+        assert e.status_code == 404
+    else:
+        raise AssertionError("expected 404")
+
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+    response = loop.run_until_complete(_save(server, email, {"n": 1}, key))
+    assert response["success"] is True
+
+
+def test_request_in_flight_conflicts(server, loop, email):
+    key = f"key-{email}"
+    assert loop.run_until_complete(server.claim_idempotency_key("save-tool-data", email, key, "body")) is None
+    try:
+        loop.run_until_complete(server.claim_idempotency_key("save-tool-data", email, key, "body"))
+    except server.HTTPException as e:
+        assert e.status_code == 409
+    else:
+        raise AssertionError("expected 409")
+
+
+def test_response_store_failure_still_answers(server, loop, email, monkeypatch):
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+    keys = server.db.idempotency_keys
+
+    async def failing_update_one(*args, **kwargs):
+        raise ConnectionError("down")
+
+    monkeypatch.setattr(keys, "update_one", failing_update_one)
+    monkeypatch.setattr(server.db, "idempotency_keys", keys, raising=False)
+
+    response = loop.run_until_complete(_save(server, email, {"n": 1}, f"key-{email}"))
+    assert response["success"] is True
@@ -0,0 +1,12 @@
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+
+def test_query_shapes_use_indexes(server, loop):
+    loop.run_until_complete(server.check_query_plans())
+
+
+def test_duplicate_user_rejected(server, loop, email):
+    loop.run_until_complete(server.db.users.insert_one({"email": email}))
+    with pytest.raises(DuplicateKeyError):
+        loop.run_until_complete(server.db.users.insert_one({"email": email}))
@@ -0,0 +1,33 @@
+import asyncio
+
+
+def test_login_new_then_existing(server, loop, email):
+    first = loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+    assert first["is_new"] is True
+    assert "has_onboarding" not in first
+
+    second = loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+    assert second["is_new"] is False
+    assert second["has_onboarding"] is False
+
+
+def test_concurrent_first_logins(server, loop, email):
+    async def storm(n):
+        return await asyncio.gather(*[server.login(server.LoginRequest(email=email)) for _ in range(n)])
+
+    results = loop.run_until_complete(storm(20))
+
+    assert sum(r["is_new"] for r in results) == 1
+    assert loop.run_until_complete(server.db.users.count_documents({"email": email})) == 1
+    assert loop.run_until_complete(server.db.progress.count_documents({"user_email": email})) == 1
+
+
+def test_repeated_onboarding_with_same_vicio_alvo(server, loop, email):
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+    request = server.OnboardingRequest(email=email, vicio_alvo="cigarro")
+
+    first = loop.run_until_complete(server.complete_onboarding(request))
+    second = loop.run_until_complete(server.complete_onboarding(request))
+
+    assert first["success"] is True
+    assert second["success"] is True
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import queue
+import sys
+import time
+
+import orjson
+
+import logs
+
+
+def _record(message="Login error: boom", level=logging.ERROR, exc_info=None):
+    return logging.LogRecord("root", level, __file__, 1, message, None, exc_info)
+
+
+def test_sampling_suppresses_repeats_and_reports_count():
+    sampler = logs.SamplingFilter(burst=3, window=0.05)
+
+    passed = [sampler.filter(_record()) for _ in range(5)]
+    assert passed == [True, True, True, False, False]
+    assert sampler.filter(_record("Other error")) is True
+    assert sampler.filter(_record(level=logging.INFO))
+
+    time.sleep(0.06)
+    record = _record()
+    assert sampler.filter(record) is True
+    assert record.suppressed == 2
+
+
+def test_records_carry_request_context_and_render_as_json():
+    log_queue = queue.Queue()
+    handler = logs.ContextQueueHandler(log_queue)
+
+    async def app(scope, receive, send):
+        logs.bind(email="a@example.com")
+        try:
+            raise ValueError("boom")
+        except ValueError as e:
+            handler.handle(_record(exc_info=(type(e), e, e.__traceback__)))
+
+    middleware = logs.RequestContextMiddleware(app)
+    asyncio.run(middleware({"type": "http", "path": "/api/auth/login"}, None, None))
+
+    entry = orjson.loads(logs.JSONFormatter().format(log_queue.get_nowait()))
+    assert entry["message"] == "Login error: boom"
+    assert entry["route"] == "/api/auth/login"
+    assert entry["email_hash"] == logs.email_hash("a@example.com")
+    assert entry["latency_ms"] >= 0
+    assert entry["error"] == "ValueError"
+    assert "Traceback" in entry["traceback"]
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = logs.ContextQueueHandler(queue.Queue(1))
+
+    handler.handle(_record())
+    handler.handle(_record())
+
+    assert handler.dropped == 1
+
+
+def test_sampling_keys_on_template_not_values():
+    sampler = logs.SamplingFilter(burst=2, window=60)
+
+    def record(error):
+        return logging.LogRecord("root", logging.ERROR, __file__, 1, "Login error: %s", (error,), None)
+
+    passed = [sampler.filter(record(f"E11000 duplicate key: user{n}@example.com")) for n in range(4)]
+    assert passed == [True, True, False, False]
+
+
+def test_json_records_redact_emails():
+    try:
+        raise ValueError("E11000 duplicate key: { email: \"ana@example.com\" }")
+    except ValueError:
+        record = logging.LogRecord("root", logging.ERROR, __file__, 1, "Login error: %s", ("ana@example.com",), sys.exc_info())
+
+    entry = orjson.loads(logs.JSONFormatter().format(record))
+
+    assert "ana@example.com" not in entry["message"] + entry["traceback"]
+    assert logs.email_hash("ana@example.com") in entry["message"]
@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(("/a",), 0.05)
+    histogram.observe(("/a",), 0.5)
+    histogram.observe(("/a",), 5)
+
+    text = metrics.render([histogram])
+
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{route="/a"} 3' in text
+    assert "# TYPE latency_seconds histogram" in text
+
+
+def test_mongo_commands_are_timed(server, loop, email):
+    loop.run_until_complete(server.db.users.find_one({"email": email}))
+
+    text = metrics.render([metrics.mongo_command_duration_seconds])
+
+    assert 'mongo_command_duration_seconds_count{collection="users",command="find"}' in text
+
+
+def test_pool_monitor_tracks_connections_per_server():
+    monitor = metrics.MongoPoolMonitor()
+    event = SimpleNamespace(address=("db1", 27017))
+
+    for _ in range(3):
+        monitor.connection_created(event)
+    monitor.connection_checked_out(event)
+    monitor.connection_checked_out(event)
+    monitor.connection_checked_in(event)
+    monitor.connection_closed(event)
+
+    assert monitor.stats() == {"db1:27017": {"connections": 2, "checked_out": 1}}
+    assert metrics.mongo_pool_connections.value(("db1:27017",)) == 2
+
+
+def test_operational_routes_require_admin(server):
+    routes = {route.path: route for route in server.app.routes if hasattr(route, "dependant")}
+
+    for path in ["/api/metrics", "/api/stats", "/api/cache/stats"]:
+        assert server.require_admin in [dependency.call for dependency in routes[path].dependant.dependencies]
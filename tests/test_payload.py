@@ -0,0 +1,118 @@
+import asyncio
+
+import httpx
+import orjson
+import pytest
+
+from payload import FieldLimits, JSONScanner, PayloadLimitMiddleware, PayloadRejected, RouteLimits
+
+LIMITS = FieldLimits(max_bytes=200, max_depth=3, max_keys=5)
+
+
+def scan(body: bytes, chunk: int = 7):
+    scanner = JSONScanner({"data": LIMITS, "operations.*.data": LIMITS})
+    for start in range(0, len(body), chunk):
+        scanner.feed(body[start:start + chunk])
+
+
+def test_scanner_accepts_bounded_fields():
+    scan(orjson.dumps({
+        "email": "a@example.com",
+        "note": {"a": {"b": {"c": {"d": "other fields are not limited"}}}},
+        "data": {"mood": "ok", "text": 'with "quotes", {braces} and \\\\ [brackets]', "list": [1, {"k": 2}]},
+    }))
+
+
+@pytest.mark.parametrize("data, reason", [
+    ({"text": "x" * 300}, "bytes"),
+    ({"a": {"b": {"c": {"d": 1}}}}, "depth"),
+    ({f"k{n}": n for n in range(6)}, "keys"),
+])
+def test_scanner_rejects_fields_over_limits(data, reason):
+    with pytest.raises(PayloadRejected) as rejected:
+        scan(orjson.dumps({"email": "a@example.com", "data": data}))
+    assert rejected.value.reason == reason
+
+
+def test_scanner_limits_fields_inside_arrays():
+    ok = {"type": "save_tool_data", "dia": 1, "data": {"a": 1}}
+    deep = {"type": "save_tool_data", "dia": 2, "data": {"a": {"b": {"c": {"d": 1}}}}}
+    scan(orjson.dumps({"operations": [ok, ok]}))
+    with pytest.raises(PayloadRejected):
+        scan(orjson.dumps({"operations": [ok, deep]}))
+
+
+@pytest.mark.parametrize("body", [
+    rb'{"d\u0061ta": {"a": {"b": {"c": {"d": 1}}}}}',
+    rb'{"operations": [{"\u0064ata": {"a": {"b": {"c": {"d": 1}}}}}]}',
+])
+def test_scanner_decodes_escaped_keys(body):
+    with pytest.raises(PayloadRejected) as rejected:
+        scan(body, chunk=3)
+    assert rejected.value.reason == "depth"
+
+
+def test_middleware_rejects_before_reading_the_whole_body():
+    body = orjson.dumps({"email": "a@example.com", "data": {"text": "x" * 1000}})
+    chunks = [body[start:start + 100] for start in range(0, len(body), 100)]
+    received = []
+    sent = []
+    called = []
+
+    async def receive():
+        received.append(chunks[len(received)])
+        return {"type": "http.request", "body": received[-1], "more_body": len(received) < len(chunks)}
+
+    async def send(message):
+        sent.append(message)
+
+    async def app(scope, receive, send):
+        called.append(scope)
+
+    middleware = PayloadLimitMiddleware(app, {("POST", "/save"): RouteLimits(4096, {"data": LIMITS})})
+    scope = {"type": "http", "method": "POST", "path": "/save", "headers": []}
+    asyncio.run(middleware(scope, receive, send))
+
+    assert not called
+    assert sent[0]["status"] == 413
+    assert len(received) < len(chunks)
+
+
+def test_middleware_replays_accepted_body():
+    body = orjson.dumps({"email": "a@example.com", "data": {"mood": "ok"}})
+    messages = [
+        {"type": "http.request", "body": body[:10], "more_body": True},
+        {"type": "http.request", "body": body[10:], "more_body": False},
+    ]
+    seen = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def app(scope, receive, send):
+        while True:
+            message = await receive()
+            seen.append(message["body"])
+            if not message["more_body"]:
+                break
+
+    middleware = PayloadLimitMiddleware(app, {("POST", "/save"): RouteLimits(4096, {"data": LIMITS})})
+    scope = {"type": "http", "method": "POST", "path": "/save", "headers": [(b"content-length", str(len(body)).encode())]}
+    asyncio.run(middleware(scope, receive, None))
+
+    assert b"".join(seen) == body
+
+
+def test_rejections_carry_cors_headers(server, loop):
+    origin = "https://app7d.netlify.app"
+    body = orjson.dumps({"email": "a@example.com", "dia": 1, "data": {"text": "x" * (server.TOOL_DATA_LIMITS.max_bytes + 1)}})
+
+    async def post():
+        transport = httpx.ASGITransport(app=server.create_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await http.post("/api/progress/save-tool-data", content=body, headers={"Origin": origin})
+
+    response = loop.run_until_complete(post())
+
+    assert response.status_code == 413
+    assert response.headers["access-control-allow-origin"] == origin
@@ -0,0 +1,36 @@
+import time
+from datetime import datetime
+
+from fastapi import Response
+
+
+def test_progress_field_projection(server, loop, email):
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+
+    progress = loop.run_until_complete(server.get_progress(email, Response(), fields="pontos_totais,medalhas"))
+
+    assert set(progress) == {"_id", "updated_at", "pontos_totais", "medalhas"}
+
+
+def test_progress_unknown_field(server, loop, email):
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+    try:
+        loop.run_until_complete(server.get_progress(email, Response(), fields="senha"))
+    except server.HTTPException as e:
+        assert e.status_code == 400
+    else:
+        raise AssertionError("expected 400")
+
+
+def test_tool_data_since(server, loop, email):
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+    loop.run_until_complete(server.save_tool_data(server.SaveToolDataRequest(email=email, dia=1, data={"a": 1})))
+    checkpoint = loop.run_until_complete(server.get_progress(email, Response()))["updated_at"]
+    time.sleep(0.01)  # updated_at has millisecond precision
+    loop.run_until_complete(server.save_tool_data(server.SaveToolDataRequest(email=email, dia=2, data={"b": 2})))
+
+    delta = loop.run_until_complete(server.get_progress(email, Response(), fields="pontos_totais", since=checkpoint))
+    assert delta["tool_data"] == {"dia_2": {"b": 2}}
+
+    full = loop.run_until_complete(server.get_progress(email, Response(), since=datetime(2000, 1, 1)))
+    assert set(full["tool_data"]) == {"dia_1", "dia_2"}
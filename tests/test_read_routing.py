@@ -0,0 +1,103 @@
+import os
+import time
+import uuid
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import SecondaryPreferred
+
+import consistency
+
+
+def test_reads_use_secondaries_until_the_user_writes(server, loop, email, monkeypatch):
+    secondary = object()
+    monkeypatch.setattr(server, "secondary_db", secondary)
+    server.read_pins.clear()
+
+    assert server.reader(email) is secondary
+    assert server.reader() is secondary
+
+    server.invalidate_progress(email)
+    assert server.reader(email) is server.db
+    assert server.reader(f"other-{email}") is secondary
+
+
+@pytest.fixture
+def replica_set(loop):
+    """A three-member replica set at MONGO_REPLICA_SET_URL, e.g. started with
+    mongod --replSet rs0 on ports 27017-27019 and rs.initiate() listing all three
+    """
+    url = os.environ.get("MONGO_REPLICA_SET_URL")
+    if not url:
+        pytest.skip("MONGO_REPLICA_SET_URL not set")
+    client = AsyncIOMotorClient(url, serverSelectionTimeoutMS=2000)
+    yield client
+    client.close()
+
+
+def test_secondary_preferred_reads_from_a_secondary(replica_set, loop):
+    email = f"test-{uuid.uuid4().hex[:12]}@example.com"
+    primary = replica_set["test_read_routing"]
+    secondary = replica_set.get_database("test_read_routing", read_preference=SecondaryPreferred(max_staleness=90))
+
+    async def scenario():
+        await primary.users.insert_one({"email": email})
+        await primary.command("ping")
+        cursor = secondary.users.find({"email": email})
+        await cursor.to_list(None)
+        return cursor.address, replica_set.primary
+
+    address, primary_address = loop.run_until_complete(scenario())
+    assert address != primary_address
+
+
+def test_reads_after_a_write_skip_the_secondary_and_its_cache(server, loop, email, monkeypatch):
+    # A database the write never reaches stands in for a lagging secondary
+    lagging = server.client["test_lagging_secondary"]
+    loop.run_until_complete(lagging.progress.insert_one({"user_email": email, "stale": True}))
+    monkeypatch.setattr(server, "secondary_db", lagging)
+    server.read_pins.clear()
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+
+    assert "stale" not in loop.run_until_complete(server.load_progress(email))
+    assert server.progress_cache.get(email) is not None
+
+    # Another worker, which neither made nor saw the write
+    server.read_pins.clear()
+    server.progress_cache.invalidate(email)
+    token = consistency._last_write.set(time.time())
+    try:
+        assert "stale" not in loop.run_until_complete(server.load_progress(email))
+    finally:
+        consistency._last_write.reset(token)
+
+    server.read_pins.clear()
+    server.progress_cache.invalidate(email)
+    assert loop.run_until_complete(server.load_progress(email))["stale"]
+    assert server.progress_cache.get(email) is None
+
+
+def test_write_marker_is_returned_on_writes_and_read_back(loop):
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(consistency.last_write())
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def call(method, headers):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": method, "path": "/api/x", "headers": headers}
+        await consistency.WriteMarkerMiddleware(app)(scope, None, send)
+        return dict(sent[0]["headers"])
+
+    written = loop.run_until_complete(call("POST", []))
+    read = loop.run_until_complete(call("GET", [(b"x-last-write", written[b"x-last-write"])]))
+
+    assert seen[0] == 0
+    assert seen[1] == float(written[b"x-last-write"])
+    assert b"x-last-write" not in read
+    assert consistency.last_write() == 0
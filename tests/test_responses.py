@@ -0,0 +1,35 @@
+import gzip
+from datetime import datetime
+
+import orjson
+from bson import ObjectId
+
+from responses import BSONResponse, compressed
+
+
+def test_bson_response_renders_objectid_and_datetime():
+    oid = ObjectId()
+    response = BSONResponse({"_id": oid, "updated_at": datetime(2026, 1, 2, 3, 4, 5, 600000), "dias": [1, 2]})
+
+    assert orjson.loads(response.body) == {
+        "_id": str(oid),
+        "updated_at": "2026-01-02T03:04:05.600000",
+        "dias": [1, 2],
+    }
+
+
+def test_compressed_encodes_large_bodies_only():
+    content = {"tool_data": {f"dia_{n}": "x" * 100 for n in range(50)}}
+
+    response = compressed(content, "gzip;q=1, br;q=0", {"ETag": '"v1"'}, minimum_size=1024)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["ETag"] == 'W/"v1"'
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert orjson.loads(gzip.decompress(response.body)) == content
+
+    small = compressed({"dia": 1}, "gzip", {"ETag": '"v1"'}, minimum_size=1024)
+    assert "Content-Encoding" not in small.headers
+    assert small.headers["ETag"] == '"v1"'
+
+    identity = compressed(content, "identity", minimum_size=1024)
+    assert orjson.loads(identity.body) == content
@@ -0,0 +1,17 @@
+def test_session_returns_user_and_progress(server, loop, email):
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+
+    session = loop.run_until_complete(server.get_session(email))
+
+    assert session["user"]["email"] == email
+    assert session["progress"]["user_email"] == email
+    assert "_id" in session["user"]
+
+
+def test_session_unknown_user(server, loop, email):
+    try:
+        loop.run_until_complete(server.get_session(email))
+    except server.HTTPException as e:
+        assert e.status_code == 404
+    else:
+        raise AssertionError("expected 404")
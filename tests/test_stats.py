@@ -0,0 +1,73 @@
+import uuid
+from datetime import datetime
+
+import stats
+
+
+def test_onboarding_counters_move_user_between_categories():
+    now = datetime(2026, 1, 31)
+
+    assert stats.onboarding_counters(now, None, "jogos") == {
+        "totals": {"onboarded": 1},
+        "day:2026-01-31": {"onboarded": 1},
+        "vicio:jogos": {"users": 1},
+    }
+    assert stats.onboarding_counters(now, "jogos", "jogos") == {}
+    assert stats.onboarding_counters(now, "jogos", "redes", {"pontos_totais": 150, "dias_completados": [1, 2]}) == {
+        "vicio:jogos": {"users": -1, "pontos": -150, "dias_completados.dia_1": -1, "dias_completados.dia_2": -1},
+        "vicio:redes": {"users": 1, "pontos": 150, "dias_completados.dia_1": 1, "dias_completados.dia_2": 1},
+    }
+
+
+def test_merge_buckets_sums_counters():
+    now = datetime(2026, 1, 31)
+
+    merged = stats.merge_buckets(
+        stats.complete_day_counters(now, "jogos", 1, 50),
+        stats.complete_day_counters(now, "jogos", 2, 50),
+    )
+
+    assert len(merged) == 3
+    assert merged["totals"] == {"pontos": 100, "dias_completados.dia_1": 1, "dias_completados.dia_2": 1}
+
+
+def _vicio_stats(loop, server, vicio_alvo):
+    loop.run_until_complete(server.write_behind.flush())
+    return loop.run_until_complete(server.get_stats(1))["vicio_alvo"].get(vicio_alvo, {})
+
+
+def test_routes_maintain_counters(loop, server, email):
+    vicio_alvo = f"stats-{uuid.uuid4().hex[:8]}"
+    loop.run_until_complete(server.write_behind.flush())
+    before = loop.run_until_complete(server.get_stats(1))
+
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+    loop.run_until_complete(server.complete_onboarding(server.OnboardingRequest(email=email, vicio_alvo=vicio_alvo)))
+    loop.run_until_complete(server.complete_day(server.CompleteDayRequest(email=email, dia=3, pontos=70)))
+    loop.run_until_complete(server.complete_day(server.CompleteDayRequest(email=email, dia=3, pontos=70)))
+
+    loop.run_until_complete(server.write_behind.flush())
+    after = loop.run_until_complete(server.get_stats(1))
+    assert after["totals"]["users"] == before["totals"].get("users", 0) + 1
+    assert after["days"][0]["dias_completados"]["dia_3"] == before["days"][0].get("dias_completados", {}).get("dia_3", 0) + 1
+    assert _vicio_stats(loop, server, vicio_alvo) == {"users": 1, "pontos": 70, "dias_completados": {"dia_3": 1}}
+
+    # Changing category takes the user's points along
+    loop.run_until_complete(server.complete_onboarding(server.OnboardingRequest(email=email, vicio_alvo=vicio_alvo + "-b")))
+    assert _vicio_stats(loop, server, vicio_alvo) == {"users": 0, "pontos": 0, "dias_completados": {"dia_3": 0}}
+    assert _vicio_stats(loop, server, vicio_alvo + "-b") == {"users": 1, "pontos": 70, "dias_completados": {"dia_3": 1}}
+
+
+def test_rebuild_repairs_drift(loop, server, email):
+    vicio_alvo = f"stats-{uuid.uuid4().hex[:8]}"
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+    loop.run_until_complete(server.complete_onboarding(server.OnboardingRequest(email=email, vicio_alvo=vicio_alvo)))
+    loop.run_until_complete(stats.rebuild(server.db))
+
+    loop.run_until_complete(server.db.stats.update_one({"_id": f"vicio:{vicio_alvo}"}, {"$inc": {"users": 5}}))
+
+    drift = loop.run_until_complete(stats.rebuild(server.db, check_only=True))
+    assert drift == [f"vicio:{vicio_alvo} users: 6 -> 1"]
+
+    loop.run_until_complete(stats.rebuild(server.db))
+    assert loop.run_until_complete(stats.rebuild(server.db, check_only=True)) == []
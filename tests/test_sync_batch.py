@@ -0,0 +1,55 @@
+import asyncio
+
+
+def test_sync_batch_applies_operations_in_order(server, loop, email):
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+
+    request = server.SyncBatchRequest(email=email, operations=[
+        {"type": "complete_day", "dia": 1, "pontos": 50},
+        {"type": "save_tool_data", "dia": 1, "data": {"gatilhos": ["tédio"]}},
+        {"type": "complete_day", "dia": 1, "pontos": 50},
+        {"type": "complete_day", "dia": 2, "pontos": 30},
+    ])
+    response = loop.run_until_complete(server.sync_batch(request))
+
+    results = response["results"]
+    assert len(results) == 4
+    assert results[0]["novas_medalhas"] == ["primeira_vitoria"]
+    assert results[2]["already_completed"] is True
+    assert results[3]["already_completed"] is False
+
+    progress = loop.run_until_complete(server.db.progress.find_one({"user_email": email}))
+    assert progress["dias_completados"] == [1, 2]
+    assert progress["pontos_totais"] == 80
+    tool_data = loop.run_until_complete(server.get_tool_data(email, 1))
+    assert tool_data["data"] == {"gatilhos": ["tédio"]}
+
+
+def test_sync_batch_unknown_user(server, loop, email):
+    request = server.SyncBatchRequest(email=email, operations=[])
+    try:
+        loop.run_until_complete(server.sync_batch(request))
+    except server.HTTPException as e:
+        assert e.status_code == 404
+    else:
+        raise AssertionError("expected 404")
+
+
+def test_sync_batch_reports_days_completed_concurrently(server, loop, email):
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+    request = server.SyncBatchRequest(email=email, operations=[{"type": "complete_day", "dia": 1, "pontos": 50}])
+
+    async def race():
+        return await asyncio.gather(
+            server.sync_batch(request),
+            server.complete_day(server.CompleteDayRequest(email=email, dia=1, pontos=50))
+        )
+
+    batch, single = loop.run_until_complete(race())
+
+    assert [batch["results"][0]["already_completed"], single["already_completed"]].count(False) == 1
+    progress = loop.run_until_complete(server.db.progress.find_one({"user_email": email}))
+    assert progress["pontos_totais"] == 50
+    loop.run_until_complete(server.event_log.flush())
+    events = loop.run_until_complete(server.get_events(email))
+    assert [event["type"] for event in events["events"]].count("complete_day") == 1
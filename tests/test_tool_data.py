@@ -0,0 +1,44 @@
+def _save(server, email, dia, data):
+    return server.save_tool_data(server.SaveToolDataRequest(email=email, dia=dia, data=data))
+
+
+def test_tool_data_versions_and_history(server, loop, email, monkeypatch):
+    monkeypatch.setattr(server, "TOOL_DATA_HISTORY", 2)
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+
+    for n in range(4):
+        loop.run_until_complete(_save(server, email, 1, {"n": n, "nota": "$n"}))
+
+    latest = loop.run_until_complete(server.get_tool_data(email, 1))
+    assert latest["version"] == 4
+    assert latest["data"] == {"n": 3, "nota": "$n"}
+    assert "history" not in latest
+
+    full = loop.run_until_complete(server.get_tool_data(email, 1, history=True))
+    assert [entry["version"] for entry in full["history"]] == [2, 3]
+
+    progress = loop.run_until_complete(server.db.progress.find_one({"user_email": email}))
+    assert "tool_data" not in progress
+    assert "dia_1" in progress["tool_data_updated_at"]
+
+
+def test_legacy_embedded_tool_data(server, loop, email):
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+    loop.run_until_complete(server.db.progress.update_one(
+        {"user_email": email}, {"$set": {"tool_data.dia_2": {"legacy": True}}}
+    ))
+
+    tool_data = loop.run_until_complete(server.get_tool_data(email, 2))
+    assert tool_data["data"] == {"legacy": True}
+    assert tool_data["version"] == 0
+
+
+def test_save_tool_data_unknown_user(server, loop, email):
+    try:
+        loop.run_until_complete(_save(server, email, 1, {}))
+    except server.HTTPException as e:
+        assert e.status_code == 404
+    else:
+        raise AssertionError("expected 404")
+
+    assert loop.run_until_complete(server.db.tool_data.count_documents({"user_email": email})) == 0
@@ -0,0 +1,89 @@
+import asyncio
+import time
+from datetime import datetime
+
+from write_behind import WriteBehindBuffer
+
+
+def test_updates_coalesce_into_one_write(server, loop, email):
+    loop.run_until_complete(server.db.users.insert_one({"email": email}))
+    buffer = WriteBehindBuffer(server.db)
+
+    for day in range(1, 4):
+        buffer.set("users", {"email": email}, {"last_active": datetime(2026, 1, day)})
+    assert buffer.stats()["pending"] == 1
+
+    loop.run_until_complete(buffer.close())
+
+    user = loop.run_until_complete(server.db.users.find_one({"email": email}))
+    assert user["last_active"] == datetime(2026, 1, 3)
+    assert buffer.stats() == {"pending": 0, "queued": 3, "flushed": 1, "dropped": 0}
+
+
+def test_existing_user_login_is_written_behind(server, loop, email):
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+    before = loop.run_until_complete(server.db.users.find_one({"email": email}))
+    time.sleep(0.01)  # last_active has millisecond precision
+
+    loop.run_until_complete(server.login(server.LoginRequest(email=email)))
+    assert loop.run_until_complete(server.db.users.find_one({"email": email}))["last_active"] == before["last_active"]
+
+    loop.run_until_complete(server.write_behind.flush())
+    assert loop.run_until_complete(server.db.users.find_one({"email": email}))["last_active"] > before["last_active"]
+
+
+def test_failed_flush_keeps_newer_fields(fake_collection):
+    users = fake_collection()
+    users.errors.append(ConnectionError("down"))
+    buffer = WriteBehindBuffer({"users": users})
+    buffer.set("users", {"email": "a@example.com"}, {"last_active": datetime(2026, 1, 1), "x": 1})
+
+    asyncio.run(buffer.flush())
+    buffer.set("users", {"email": "a@example.com"}, {"last_active": datetime(2026, 1, 2)})
+    asyncio.run(buffer.flush())
+
+    assert [write._doc["$set"] for write in users.writes] == [{"last_active": datetime(2026, 1, 2), "x": 1}]
+
+
+def test_increments_add_up_and_upsert(server, loop):
+    key = f"test:{time.time_ns()}"
+    buffer = WriteBehindBuffer(server.db)
+
+    buffer.inc("stats", {"_id": key}, {"logins": 1})
+    buffer.inc("stats", {"_id": key}, {"logins": 1, "pontos": 50})
+    loop.run_until_complete(buffer.close())
+
+    assert loop.run_until_complete(server.db.stats.find_one({"_id": key})) == {"_id": key, "logins": 2, "pontos": 50}
+    assert buffer.stats()["flushed"] == 1
+
+
+def test_partial_failure_retries_only_rejected_updates(fake_collection):
+    stats = fake_collection()
+    stats.errors.append(fake_collection.rejecting(1))
+    buffer = WriteBehindBuffer({"stats": stats})
+    for day in range(1, 4):
+        buffer.inc("stats", {"_id": f"2026-01-0{day}"}, {"logins": 1})
+
+    asyncio.run(buffer.flush())
+    asyncio.run(buffer.flush())
+
+    assert [(write._filter["_id"], write._doc["$inc"]) for write in stats.writes] == [
+        ("2026-01-01", {"logins": 1}),
+        ("2026-01-03", {"logins": 1}),
+        ("2026-01-02", {"logins": 1}),
+    ]
+    assert buffer.stats()["pending"] == 0
+
+
+def test_unknown_outcome_retries_fields_and_drops_increments(fake_collection):
+    stats = fake_collection()
+    stats.errors.append(ConnectionError("reset"))
+    buffer = WriteBehindBuffer({"stats": stats})
+    buffer.inc("stats", {"_id": "2026-01-01"}, {"logins": 1})
+    buffer.set("stats", {"_id": "2026-01-01"}, {"updated": True})
+
+    asyncio.run(buffer.flush())
+    asyncio.run(buffer.flush())
+
+    assert [write._doc for write in stats.writes] == [{"$set": {"updated": True}}]
+    assert buffer.stats()["dropped"] == 1